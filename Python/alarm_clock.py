@@ -1,25 +1,242 @@
-from datetime import datetime   
-from playsound import playsound
-from pydub import AudioSegment
-import winsound
-from pydub.playback import play
-
-alarm_time = input("Enter the time of alarm to be set:HH:MM:SS\n") #format- 04:55:00 pm
-alarm_hour=alarm_time[0:2]
-alarm_minute=alarm_time[3:5]
-alarm_seconds=alarm_time[6:8]
-alarm_period = alarm_time[9:11].upper()
-print("Setting up alarm..")
-while True:
+import heapq
+import itertools
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Alarm scheduler: pending alarms sit in heaps ordered by deadline and one
+# thread sleeps on a Condition until the earliest one is due (or until an add
+# or cancel changes it), so an idle clock uses almost no CPU however many alarms
+# are set. Cancelled alarms are dropped lazily when they reach the top of a heap.
+#
+# Alarms set for a wall-clock time (a datetime) are kept by time.time() in their
+# own heap and the thread never sleeps longer than WALL_CLOCK_SLICE while one is
+# pending, so DST changes, clock adjustments and suspend/resume are noticed.
+# Alarms set as "seconds from now" use time.monotonic().
+#
+#   python alarm_clock.py          # prompt for one alarm, e.g. 04:55:00 pm
+#   python alarm_clock.py --bench  # scheduling overhead with 100k alarms
+
+WALL_CLOCK_SLICE = 1.0
+
+class Alarm:
+    def __init__(self, alarm_id, deadline, when, label, notifiers, wall=None):
+        self.id = alarm_id
+        self.deadline = deadline    # time.monotonic() value (estimate for wall alarms)
+        self.when = when            # wall-clock datetime, for display
+        self.wall = wall            # time.time() value for wall-clock alarms, else None
+        self.label = label
+        self.notifiers = notifiers
+        self.cancelled = False
+
+class AlarmScheduler:
+    def __init__(self, notifiers=None):
+        self.notifiers = notifiers if notifiers is not None else default_notifiers()
+        self.heap = []              # (monotonic deadline, id, alarm)
+        self.wall_heap = []         # (time.time() deadline, id, alarm)
+        self.alarms = {}
+        self.ids = itertools.count(1)
+        self.cancelled = 0
+        self.condition = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="alarm-scheduler", daemon=True)
+        self.thread.start()
+
+    # when: datetime (local wall-clock time), or seconds from now. Returns an
+    # id for cancel().
+    def add(self, when, label="Wake Up!", notifiers=None):
+        notifiers = notifiers if notifiers is not None else self.notifiers
+        with self.condition:
+            alarm_id = next(self.ids)
+            if isinstance(when, datetime):
+                # timestamp() resolves naive local times with the DST rules in effect then
+                wall = when.timestamp()
+                alarm = Alarm(alarm_id, time.monotonic() + wall - time.time(), when, label, notifiers, wall)
+                heap, key = self.wall_heap, wall
+            else:
+                delay = float(when)
+                alarm = Alarm(alarm_id, time.monotonic() + delay, datetime.now() + timedelta(seconds=delay),
+                              label, notifiers)
+                heap, key = self.heap, alarm.deadline
+            self.alarms[alarm.id] = alarm
+            heapq.heappush(heap, (key, alarm.id, alarm))
+            # Only a new earliest deadline needs to wake the thread
+            if heap[0][2] is alarm:
+                self.condition.notify()
+        return alarm.id
+
+    def cancel(self, alarm_id):
+        with self.condition:
+            alarm = self.alarms.pop(alarm_id, None)
+            if alarm is None:
+                return False
+            alarm.cancelled = True
+            self.cancelled += 1
+            # Rebuild once cancelled entries dominate, so the heaps stay small
+            if self.cancelled > 1024 and self.cancelled * 2 > len(self.heap) + len(self.wall_heap):
+                self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+                self.wall_heap = [entry for entry in self.wall_heap if not entry[2].cancelled]
+                heapq.heapify(self.heap)
+                heapq.heapify(self.wall_heap)
+                self.cancelled = 0
+            return True
+
+    def pending(self):
+        with self.condition:
+            return len(self.alarms)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+    # Pop cancelled entries off the top and due alarms into `due`; returns the
+    # seconds until the next deadline of this heap, or None if it is empty
+    def _drain(self, heap, now, due):
+        while heap:
+            key, _, alarm = heap[0]
+            if alarm.cancelled:
+                heapq.heappop(heap)
+                self.cancelled -= 1
+            elif key <= now:
+                heapq.heappop(heap)
+                del self.alarms[alarm.id]
+                due.append(alarm)
+            else:
+                return key - now
+        return None
+
+    def _run(self):
+        while True:
+            with self.condition:
+                due = []
+                while self.running:
+                    mono_wait = self._drain(self.heap, time.monotonic(), due)
+                    wall_wait = self._drain(self.wall_heap, time.time(), due)
+                    if due:
+                        break
+                    if wall_wait is not None:
+                        wall_wait = min(wall_wait, WALL_CLOCK_SLICE)
+                    waits = [w for w in (mono_wait, wall_wait) if w is not None]
+                    self.condition.wait(min(waits) if waits else None)
+                if not self.running:
+                    return
+            # Notify outside the lock so slow notifiers never block add/cancel
+            for alarm in due:
+                for notify in alarm.notifiers:
+                    try:
+                        notify(alarm)
+                    except Exception as e:
+                        print(f"Notifier {notify} failed: {e}", file=sys.stderr)
+
+#Notifiers: any callable taking the Alarm
+def print_notifier(alarm):
+    print(f"{alarm.label} ({alarm.when:%I:%M:%S %p})", flush=True)
+
+def bell_notifier(alarm):
+    sys.stdout.write("\a")
+    sys.stdout.flush()
+
+def command_notifier(*command):
+    def notify(alarm):
+        subprocess.Popen(list(command) + [alarm.label], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return notify
+
+def sound_notifier(path):
+    def notify(alarm):
+        for player in ("paplay", "aplay", "afplay"):
+            if shutil.which(player):
+                subprocess.Popen([player, path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                return
+        bell_notifier(alarm)
+    return notify
+
+def winsound_notifier(alarm):
+    import winsound
+    winsound.Beep(1000, 3000)
+
+def default_notifiers():
+    notifiers = [print_notifier]
+    if sys.platform == "win32":
+        notifiers.append(winsound_notifier)
+    elif shutil.which("notify-send"):
+        notifiers.append(command_notifier("notify-send", "Alarm"))
+        notifiers.append(bell_notifier)
+    else:
+        notifiers.append(bell_notifier)
+    return notifiers
+
+#"04:55:00 pm" (or 24-hour "16:55:00") -> next occurrence of that time
+def parse_alarm_time(text):
+    text = text.strip().upper()
+    fmt = "%I:%M:%S %p" if text.endswith(("AM", "PM")) else "%H:%M:%S"
+    parsed = datetime.strptime(text, fmt)
     now = datetime.now()
-    current_hour = now.strftime("%I")
-    current_minute = now.strftime("%M")
-    current_seconds = now.strftime("%S")
-    current_period = now.strftime("%p")
-    if(alarm_period==current_period):
-        if(alarm_hour==current_hour):
-            if(alarm_minute==current_minute):
-                if(alarm_seconds==current_seconds):
-                    print("Wake Up!")
-                    winsound.Beep(1000,3000)
-                    break
\ No newline at end of file
+    when = now.replace(hour=parsed.hour, minute=parsed.minute, second=parsed.second, microsecond=0)
+    if when <= now:
+        when += timedelta(days=1)
+    return when
+
+def benchmark(count=100000):
+    fired = []
+    done = threading.Event()
+    scheduler = AlarmScheduler(notifiers=[])
+
+    started = time.perf_counter()
+    ids = [scheduler.add(3600 + random.random() * 3600) for _ in range(count)]
+    add_rate = count / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for alarm_id in random.sample(ids, count // 2):
+        scheduler.cancel(alarm_id)
+    cancel_rate = (count // 2) / (time.perf_counter() - started)
+
+    #Idle CPU with everything pending far in the future
+    cpu, wall = time.process_time(), time.perf_counter()
+    time.sleep(2)
+    idle = (time.process_time() - cpu) / (time.perf_counter() - wall)
+    scheduler.stop()
+
+    #Firing latency: count alarms due over the next two seconds
+    def record(alarm):
+        fired.append(time.monotonic() - alarm.deadline)
+        if len(fired) == count:
+            done.set()
+    scheduler = AlarmScheduler(notifiers=[record])
+    for _ in range(count):
+        scheduler.add(0.5 + random.random() * 2)
+    done.wait(30)
+    scheduler.stop()
+    fired.sort()
+
+    print(f"{count} alarms")
+    print(f"  add:    {add_rate:,.0f} alarms/s")
+    print(f"  cancel: {cancel_rate:,.0f} alarms/s")
+    print(f"  idle CPU with {count - count // 2} pending: {idle * 100:.2f}% of a core")
+    if fired:
+        print(f"  fired {len(fired)}; lateness median {fired[len(fired) // 2] * 1000:.2f} ms, "
+              f"p99 {fired[int(len(fired) * 0.99)] * 1000:.2f} ms, max {fired[-1] * 1000:.2f} ms")
+
+def main():
+    if "--bench" in sys.argv[1:]:
+        benchmark()
+        return
+    alarm_time = input("Enter the time of alarm to be set:HH:MM:SS\n") #format- 04:55:00 pm
+    when = parse_alarm_time(alarm_time)
+    rang = threading.Event()
+    scheduler = AlarmScheduler()
+    scheduler.add(when, notifiers=scheduler.notifiers + [lambda alarm: rang.set()])
+    print(f"Setting up alarm for {when:%Y-%m-%d %I:%M:%S %p}..")
+    try:
+        rang.wait()
+    except KeyboardInterrupt:
+        pass
+    scheduler.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,271 @@
-def find_factors(num):
-    factors = []
-    for i in range(1, num + 1):
-        if num % i == 0:
-            factors.append(i)
-    return factors
-
-
-num = int(input("Enter a number: "))
-print("Factors of", num, "are:", find_factors(num))
+import math
+import random
+import sys
+import time
+from array import array
+
+# Factors of a number, fast enough for 10^12-range inputs and batches.
+#
+#   find_factors(n)            sorted divisors of n
+#   prime_factors(n)           {prime: exponent}
+#   find_factors_batch(nums)   {n: sorted divisors} for many numbers at once
+#
+# Small numbers are factored with a cached smallest-prime-factor sieve, large
+# ones with trial division by small primes, Miller-Rabin and Pollard's rho.
+# Divisors are then generated from the prime factorization.
+
+SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+SIEVE_LIMIT = 10 ** 7  # Largest sieve find_factors_batch will build
+
+
+# Original implementation: tests every integer up to num. Kept for the benchmark.
+def find_factors_linear(num):
+    factors = []
+    for i in range(1, num + 1):
+        if num % i == 0:
+            factors.append(i)
+    return factors
+
+
+# Divisor pairs (i, num // i) for i up to sqrt(num)
+def find_factors_sqrt(num):
+    if num < 1:
+        return []
+    low, high = [], []
+    for i in range(1, math.isqrt(num) + 1):
+        if num % i == 0:
+            low.append(i)
+            if i != num // i:
+                high.append(num // i)
+    return low + high[::-1]
+
+
+def _primes_up_to(limit):
+    flags = bytearray([1]) * (limit + 1)
+    flags[0:2] = b"\x00\x00"
+    for p in range(2, math.isqrt(limit) + 1):
+        if flags[p]:
+            flags[p * p::p] = bytes(len(range(p * p, limit + 1, p)))
+    return [p for p in range(2, limit + 1) if flags[p]]
+
+
+# Smallest prime factor of every number up to limit. Primes are marked in
+# descending order so the smallest prime dividing a number writes last; every
+# slice assignment runs in C.
+class SPFSieve:
+    def __init__(self, limit):
+        self.limit = limit
+        spf = array("I", range(limit + 1))
+        for p in reversed(_primes_up_to(math.isqrt(limit))):
+            count = len(range(p * p, limit + 1, p))
+            spf[p * p::p] = array("I", [p]) * count
+        self.spf = spf
+
+    def factorize(self, n):
+        factors = {}
+        spf = self.spf
+        while n > 1:
+            p = spf[n]
+            while n % p == 0:
+                n //= p
+                factors[p] = factors.get(p, 0) + 1
+        return factors
+
+
+TRIAL_PRIMES = _primes_up_to(1000)
+_sieve = None
+
+
+# Shared sieve, rebuilt (doubling) only when a larger limit is needed
+def get_sieve(limit):
+    global _sieve
+    if _sieve is None or _sieve.limit < limit:
+        size = max(limit, 2 * _sieve.limit if _sieve else 1 << 16)
+        _sieve = SPFSieve(min(size, max(limit, SIEVE_LIMIT)))
+    return _sieve
+
+
+# Miller-Rabin. The first 13 prime bases are deterministic below 3.3 * 10^24.
+def is_prime(n):
+    if n < 2:
+        return False
+    for p in SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in SMALL_PRIMES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+# Pollard's rho with Brent's cycle detection and batched gcds. n must be an
+# odd composite.
+def pollard_rho(n):
+    if n % 2 == 0:
+        return 2
+    while True:
+        y, c, m = random.randrange(1, n), random.randrange(1, n), 128
+        g = r = q = 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:
+            # The batch overshot; step one at a time from the saved point
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+
+def _add_factors(n, factors):
+    if n == 1:
+        return
+    if is_prime(n):
+        factors[n] = factors.get(n, 0) + 1
+        return
+    d = pollard_rho(n)
+    _add_factors(d, factors)
+    _add_factors(n // d, factors)
+
+
+def prime_factors(n):
+    if n < 1:
+        raise ValueError("n must be a positive integer")
+    if _sieve is not None and n <= _sieve.limit:
+        return _sieve.factorize(n)
+    factors = {}
+    for p in TRIAL_PRIMES:
+        if p * p > n:
+            break
+        while n % p == 0:
+            n //= p
+            factors[p] = factors.get(p, 0) + 1
+    _add_factors(n, factors)
+    return factors
+
+
+def divisors_from_factors(factors):
+    divisors = [1]
+    for p, exponent in factors.items():
+        divisors = [d * p ** e for d in divisors for e in range(exponent + 1)]
+    divisors.sort()
+    return divisors
+
+
+# Like the original find_factors, numbers below 1 have no factors listed
+def find_factors(num):
+    if num < 1:
+        return []
+    return divisors_from_factors(prime_factors(num))
+
+
+# Divisors of every number in [start, stop). Each d up to sqrt(stop) is added
+# with its cofactor to the numbers it divides, so lists come out sorted and no
+# number is factored individually.
+def factors_in_range(start, stop):
+    empty = {n: [] for n in range(start, min(stop, 1))}
+    start = max(start, 1)
+    low = [[] for _ in range(start, stop)]
+    high = [[] for _ in range(start, stop)]
+    for d in range(1, math.isqrt(max(stop - 1, 1)) + 1):
+        first = max(d * d, (start + d - 1) // d * d)
+        for m in range(first, stop, d):
+            i = m - start
+            low[i].append(d)
+            if m != d * d:
+                high[i].append(m // d)
+    empty.update((n, low[n - start] + high[n - start][::-1]) for n in range(start, stop))
+    return empty
+
+
+# Divisors of many numbers. When they all fit under SIEVE_LIMIT one sieve is
+# built for the largest and every number is factored by table lookups. Dense
+# ranges above that go through factors_in_range; anything else is factored
+# one number at a time.
+def find_factors_batch(nums):
+    if isinstance(nums, range) and nums.step == 1 and nums.stop - 1 > SIEVE_LIMIT:
+        if len(nums) * 64 >= math.isqrt(nums.stop):
+            return factors_in_range(nums.start, nums.stop)
+    nums = list(nums)
+    largest = max(nums, default=0)
+    if 0 < largest <= SIEVE_LIMIT:
+        sieve = get_sieve(largest)
+        return {n: divisors_from_factors(sieve.factorize(n)) if n >= 1 else [] for n in nums}
+    return {n: find_factors(n) for n in nums}
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def benchmark():
+    print("single numbers")
+    for n in (720720, 10 ** 8 + 7, 999999000001, 10 ** 12 + 39 * 10 ** 6):
+        row = [f"  n={n}"]
+        if n < 10 ** 9:
+            _, elapsed = _timed(find_factors_linear, n)
+            row.append(f"linear {elapsed * 1000:9.1f} ms")
+        expected, elapsed = _timed(find_factors_sqrt, n)
+        row.append(f"sqrt {elapsed * 1000:9.1f} ms")
+        result, elapsed = _timed(find_factors, n)
+        row.append(f"rho {elapsed * 1000:7.3f} ms")
+        assert result == expected
+        print("  ".join(row))
+
+    print("batch of 1..200000")
+    nums = range(1, 200001)
+    _, linear = _timed(lambda: [find_factors_linear(n) for n in range(1, 2001)])
+    print(f"  linear   ~{linear * 100 ** 2:9.0f} s (extrapolated from 1..2000; it is quadratic)")
+    expected, elapsed = _timed(lambda: {n: find_factors_sqrt(n) for n in nums})
+    print(f"  sqrt      {elapsed:9.2f} s")
+    result, elapsed = _timed(find_factors_batch, nums)
+    print(f"  spf sieve {elapsed:9.2f} s")
+    assert result == expected
+
+    print("batch of 10^12..10^12+200000")
+    nums = range(10 ** 12, 10 ** 12 + 200000)
+    sample = nums[:50]
+    expected, elapsed = _timed(lambda: {n: find_factors_sqrt(n) for n in sample})
+    print(f"  sqrt     ~{elapsed * len(nums) / len(sample):9.0f} s (extrapolated from 50 numbers)")
+    _, elapsed = _timed(lambda: {n: find_factors(n) for n in nums})
+    print(f"  rho       {elapsed:9.2f} s")
+    result, elapsed = _timed(find_factors_batch, nums)
+    print(f"  range     {elapsed:9.2f} s")
+    assert all(result[n] == expected[n] for n in sample)
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv[1:]:
+        benchmark()
+    else:
+        try:
+            num = int(input("Enter a number: "))
+        except ValueError:
+            sys.exit("Please enter a whole number.")
+        if num < 1:
+            sys.exit("Please enter a positive number.")
+        print("Factors of", num, "are:", find_factors(num))
@@ -1,54 +1,330 @@
-import math
-import random
+import hmac
+import heapq
+import os
+import queue
+import secrets
 import smtplib
+import sys
+import threading
 import time
+from concurrent.futures import Future
+from email.utils import formatdate
 
-def generate_otp():
-    nums = "0123456789"
-    otp = "".join(random.choices(nums, k=6))
-    return otp
-
-def send_otp(emailid):
-    otp = generate_otp()
-    msg = f"Your OTP is {otp}. This OTP is valid for only 1 minute."
-    
-    #Email credentials and settings
-    sender_email = 'Your gmail account'  #Replace with your email
-    sender_password = 'app password'       #Replace with your app password
-    smtp_server = 'smtp.gmail.com'
-    smtp_port = 587
-    
-    #Send OTP email
-    s = smtplib.SMTP(smtp_server, smtp_port)
-    s.starttls()
-    s.login(sender_email, sender_password)
-    s.sendmail(sender_email, emailid, msg)
-    s.quit()
-    
-    #Record OTP time
-    return otp, time.time()
-
-def validate_otp(input_otp, generated_otp, gen_time):
-    expiry_time = 60 
-    if input_otp == generated_otp:
-        if time.time() - gen_time <= expiry_time:
-            return True, "OTP verified Successfully..!"
-        else:
-            return False, "Your OTP has expired. A new OTP has been sent."
-    else:
-        return False, "Invalid OTP. Please check and try again."
-
-emailid = input("Enter your email: ")
-otp, gen_time = send_otp(emailid)
-
-while True:
-    user_input_otp = input("Enter Your OTP: ")
-    is_valid, message = validate_otp(user_input_otp, otp, gen_time)
-    
-    if is_valid:
-        print("OTP Verified Successfully!")
-        break
-    else:
-        print(message)
-        if "expired" in message:
-            otp, gen_time = send_otp(emailid)
+# OTP service: codes live in an in-memory TTL store (expired entries are
+# evicted; wrong guesses and issued codes are limited per user over a time
+# window that outlives any single code) and mail goes out through a
+# pool of persistent SMTP connections that each send queued messages in
+# batches, so one STARTTLS + login serves thousands of OTPs.
+#
+# SMTP settings come from the environment. To test against a local stand-in:
+#
+#   python -m aiosmtpd -n -l localhost:8025
+#   SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=0 python otp_verify.py [--bench 10000]
+
+SMTP_SETTINGS = {
+    "host": os.environ.get("SMTP_HOST", "smtp.gmail.com"),
+    "port": int(os.environ.get("SMTP_PORT", "587")),
+    "username": os.environ.get("SMTP_USER", ""),         #Your gmail account
+    "password": os.environ.get("SMTP_PASSWORD", ""),     #Your app password
+    "starttls": os.environ.get("SMTP_STARTTLS", "1") != "0",
+    "sender": os.environ.get("OTP_FROM", os.environ.get("SMTP_USER", "otp@localhost")),
+}
+
+SEND_TIMEOUT = 60  #Seconds to wait for the server to accept an OTP mail
+
+def generate_otp(digits=6):
+    return str(secrets.randbelow(10 ** digits)).zfill(digits)
+
+class TooManyRequests(Exception):
+    pass
+
+class OTPStore:
+    #Per email, at most max_attempts wrong guesses and max_issues codes in
+    #every `window` seconds, however many codes are issued in between
+    def __init__(self, ttl=60, max_attempts=5, max_issues=5, window=900):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.max_issues = max_issues
+        self.window = window
+        self.entries = {}       #email -> (otp, expires_at)
+        self.expiry = []        #heap of (expires_at, email)
+        self.limits = {}        #email -> [window_end, failures, issues]
+        self.windows = []       #heap of (window_end, email)
+        self.lock = threading.Lock()
+
+    def issue(self, email):
+        otp = generate_otp()
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            limit = self._limit(email, now)
+            if limit[1] >= self.max_attempts:
+                raise TooManyRequests(self._retry_message(limit, now, "Too many invalid attempts."))
+            if limit[2] >= self.max_issues:
+                raise TooManyRequests(self._retry_message(limit, now, "Too many OTPs requested."))
+            limit[2] += 1
+            expires_at = now + self.ttl
+            self.entries[email] = (otp, expires_at)
+            heapq.heappush(self.expiry, (expires_at, email))
+        return otp
+
+    def verify(self, email, otp):
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            limit = self._limit(email, now)
+            if limit[1] >= self.max_attempts:
+                self.entries.pop(email, None)
+                return False, self._retry_message(limit, now, "Too many invalid attempts.")
+            entry = self.entries.get(email)
+            if entry is None:
+                return False, "No OTP pending. Please request a new one."
+            if now > entry[1]:
+                del self.entries[email]
+                return False, "Your OTP has expired. Please request a new one."
+            if hmac.compare_digest(entry[0].encode(), str(otp).strip().encode()):
+                del self.entries[email]
+                limit[1] = 0
+                return True, "OTP verified Successfully..!"
+            limit[1] += 1
+            if limit[1] >= self.max_attempts:
+                del self.entries[email]
+                return False, self._retry_message(limit, now, "Too many invalid attempts.")
+            return False, "Invalid OTP. Please check and try again."
+
+    def locked(self, email):
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            limit = self.limits.get(email)
+            return limit is not None and limit[1] >= self.max_attempts
+
+    #Current window for email, started on its first failure or issued code
+    def _limit(self, email, now):
+        limit = self.limits.get(email)
+        if limit is None:
+            limit = self.limits[email] = [now + self.window, 0, 0]
+            heapq.heappush(self.windows, (limit[0], email))
+        return limit
+
+    def _retry_message(self, limit, now, reason):
+        minutes = max(1, round((limit[0] - now) / 60))
+        return f"{reason} Please try again in {minutes} minute{'s' if minutes > 1 else ''}."
+
+    #Drop expired entries and limit windows; heap items for re-issued or
+    #verified codes are skipped
+    def _evict(self, now):
+        while self.expiry and self.expiry[0][0] <= now:
+            expires_at, email = heapq.heappop(self.expiry)
+            entry = self.entries.get(email)
+            if entry is not None and entry[1] == expires_at:
+                del self.entries[email]
+        while self.windows and self.windows[0][0] <= now:
+            window_end, email = heapq.heappop(self.windows)
+            limit = self.limits.get(email)
+            if limit is not None and limit[0] == window_end:
+                del self.limits[email]
+
+    def __len__(self):
+        with self.lock:
+            self._evict(time.monotonic())
+            return len(self.entries)
+
+#Each worker thread keeps one SMTP connection open and sends whatever is
+#queued (up to batch_size messages) on it before waiting again
+class SMTPPool:
+    def __init__(self, host, port, username="", password="", starttls=True,
+                 size=4, batch_size=100, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.stats = {"sent": 0, "failed": 0, "connections": 0, "batches": 0}
+        self.stats_lock = threading.Lock()
+        self.workers = [threading.Thread(target=self._worker, name=f"smtp-{i}", daemon=True) for i in range(size)]
+        for worker in self.workers:
+            worker.start()
+
+    #Returns a Future resolved once the server accepted the message
+    def send(self, sender, recipient, data):
+        future = Future()
+        self.queue.put(((sender, [recipient], data), future))
+        return future
+
+    def close(self):
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password)
+        with self.stats_lock:
+            self.stats["connections"] += 1
+        return conn
+
+    def _count(self, key, n=1):
+        with self.stats_lock:
+            self.stats[key] += n
+
+    def _worker(self):
+        conn = None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._count("batches")
+            for message, future in batch:
+                #One retry on a fresh connection if the old one was dropped
+                for attempt in range(2):
+                    try:
+                        if conn is None:
+                            conn = self._connect()
+                        conn.sendmail(*message)
+                        future.set_result(True)
+                        self._count("sent")
+                        break
+                    except smtplib.SMTPServerDisconnected as e:
+                        conn = None
+                        if attempt:
+                            future.set_exception(e)
+                            self._count("failed")
+                    except smtplib.SMTPException as e:
+                        #Refused sender/recipient: the connection is still usable
+                        future.set_exception(e)
+                        self._count("failed")
+                        break
+                    except OSError as e:
+                        conn = None
+                        if attempt:
+                            future.set_exception(e)
+                            self._count("failed")
+                    except Exception as e:
+                        #Unknown state mid-transaction: fail this message, start a fresh connection
+                        future.set_exception(e)
+                        self._count("failed")
+                        self._discard(conn)
+                        conn = None
+                        break
+            if stop:
+                break
+        if conn is not None:
+            try:
+                conn.quit()
+            except OSError:
+                pass
+
+    def _discard(self, conn):
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+class OTPService:
+    def __init__(self, smtp_settings=None, ttl=60, max_attempts=5, max_issues=5, window=900, pool_size=4):
+        settings = dict(SMTP_SETTINGS, **(smtp_settings or {}))
+        self.sender = settings.pop("sender")
+        self.store = OTPStore(ttl=ttl, max_attempts=max_attempts, max_issues=max_issues, window=window)
+        self.pool = SMTPPool(size=pool_size, **settings)
+
+    #Messages are formatted from a template: building an EmailMessage costs
+    #more CPU than the SMTP exchange itself
+    #Addresses must be ASCII: the pooled connections do not negotiate SMTPUTF8
+    def send_otp(self, emailid):
+        if "\r" in emailid or "\n" in emailid or not emailid.isascii():
+            raise ValueError("Invalid email address")
+        otp = self.store.issue(emailid)
+        data = (
+            f"From: {self.sender}\r\nTo: {emailid}\r\nDate: {formatdate(localtime=True)}\r\n"
+            f"Subject: Your OTP\r\nContent-Type: text/plain; charset=utf-8\r\n\r\n"
+            f"Your OTP is {otp}. This OTP is valid for only {self.store.ttl // 60 or 1} minute.\r\n"
+        ).encode()
+        return self.pool.send(self.sender, emailid, data)
+
+    def validate_otp(self, emailid, input_otp):
+        return self.store.verify(emailid, input_otp)
+
+    def close(self):
+        self.pool.close()
+
+def benchmark(count):
+    service = OTPService()
+    started = time.perf_counter()
+    futures = [service.send_otp(f"user{i}@example.com") for i in range(count)]
+    failed = 0
+    for future in futures:
+        try:
+            future.result()
+        except Exception:
+            failed += 1
+    elapsed = time.perf_counter() - started
+    service.close()
+
+    started = time.perf_counter()
+    for i in range(count):
+        service.validate_otp(f"user{i}@example.com", "000000")
+    verify_elapsed = time.perf_counter() - started
+
+    stats = service.pool.stats
+    print(f"{count} OTPs sent in {elapsed:.2f} s ({count / elapsed:,.0f}/s), {failed} failed, "
+          f"{stats['connections']} SMTP connections, {stats['batches']} batches")
+    print(f"{count} verifications in {verify_elapsed:.3f} s ({count / verify_elapsed:,.0f}/s)")
+
+def main():
+    if "--bench" in sys.argv[1:]:
+        benchmark(int(sys.argv[sys.argv.index("--bench") + 1]))
+        return
+    service = OTPService()
+    try:
+        while True:
+            emailid = input("Enter your email: ").strip()
+            try:
+                service.send_otp(emailid).result(SEND_TIMEOUT)
+                break
+            except ValueError as e:
+                print(e)
+            except TooManyRequests as e:
+                print(e)
+                return
+        while True:
+            user_input_otp = input("Enter Your OTP: ")
+            is_valid, message = service.validate_otp(emailid, user_input_otp)
+            if is_valid:
+                print("OTP Verified Successfully!")
+                break
+            print(message)
+            #A lockout ends the session: no fresh code until the window passes
+            if service.store.locked(emailid):
+                break
+            if "new" in message:
+                try:
+                    service.send_otp(emailid).result(SEND_TIMEOUT)
+                except TooManyRequests as e:
+                    print(e)
+                    break
+                print("A new OTP has been sent.")
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()
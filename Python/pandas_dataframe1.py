@@ -1,11 +1,195 @@
-import pandas as pd
-df = pd.read_csv('employees_table.csv')
-print("Original DataFrame:")
-print(df)
-df['Age_Doubled'] = df['Age'] * 2
-filtered_df = df[df['Age'] > 25]
-print("\nModified DataFrame:")
-print(df)
-print("\nFiltered DataFrame (Age > 25):")
-print(filtered_df)
-df.to_csv('modified_data.csv', index=False)
+import argparse
+import resource
+import sys
+import time
+
+import pandas as pd
+
+# Derive Age_Doubled, filter Age > 25 and write the result.
+#
+#   python pandas_dataframe1.py                       # small file: print the frames
+#   python pandas_dataframe1.py big.csv --stream \
+#       --chunksize 1000000 --engine pyarrow \
+#       --output modified.parquet --filtered-output filtered.csv
+#
+# --stream reads the input in chunks with compact dtypes, applies the derive and
+# filter steps per chunk and appends each chunk to the outputs (CSV or Parquet,
+# by extension), so memory stays flat regardless of input size. --engine pyarrow
+# uses pyarrow's streaming CSV reader instead of pandas' C parser.
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+STRING = "string[pyarrow]" if pyarrow is not None else "string"
+
+# Repeated low-cardinality text becomes category; Age fits a nullable int16
+DTYPES = {
+    "name": STRING,
+    "last_name": STRING,
+    "gender": "category",
+    "email": STRING,
+    "city": "category",
+    "state": "category",
+    "zip_code": STRING,  # Keeps leading zeros
+    "Age": "Int16",
+}
+
+
+def transform(chunk):
+    # Derived column added in place; the only copy is the filtered subset
+    chunk["Age_Doubled"] = chunk["Age"] * 2
+    return chunk, chunk[chunk["Age"].gt(25).fillna(False)]
+
+
+def read_chunks_pandas(path, chunksize):
+    return pd.read_csv(path, dtype=DTYPES, chunksize=chunksize)
+
+
+# pandas' engine="pyarrow" does not support chunksize, so stream record
+# batches from pyarrow.csv directly and convert one batch at a time
+def read_chunks_pyarrow(path, chunksize):
+    import pyarrow as pa
+    from pyarrow import csv
+
+    column_types = {}
+    for name, dtype in DTYPES.items():
+        if dtype == "category":
+            column_types[name] = pa.dictionary(pa.int32(), pa.string())
+        elif dtype == "Int16":
+            column_types[name] = pa.int16()
+        else:
+            column_types[name] = pa.string()
+    # block_size is in bytes; estimate ~100 bytes per row
+    reader = csv.open_csv(
+        path,
+        read_options=csv.ReadOptions(block_size=max(1 << 20, chunksize * 100)),
+        convert_options=csv.ConvertOptions(column_types=column_types),
+    )
+    types = {pa.int16(): pd.Int16Dtype(), pa.string(): pd.StringDtype("pyarrow")}
+    for batch in reader:
+        yield batch.to_pandas(types_mapper=types.get)
+
+
+class CSVSink:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.header = True
+
+    def write(self, frame):
+        frame.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+# One row group per chunk, written under a fixed schema so chunks whose
+# categories differ still line up
+class ParquetSink:
+    def __init__(self, path):
+        if pyarrow is None:
+            sys.exit("Parquet output requires pyarrow")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        fields = []
+        for name, dtype in list(DTYPES.items()) + [("Age_Doubled", "Int16")]:
+            if dtype == "category":
+                fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+            elif dtype == "Int16":
+                fields.append(pa.field(name, pa.int16()))
+            else:
+                fields.append(pa.field(name, pa.string()))
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(path, self.schema, compression="snappy")
+
+    def write(self, frame):
+        table = self.pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+def open_sink(path):
+    if not path:
+        return None
+    return ParquetSink(path) if path.endswith(".parquet") else CSVSink(path)
+
+
+def peak_memory_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_stream(args):
+    started = time.perf_counter()
+    reader = read_chunks_pyarrow if args.engine == "pyarrow" else read_chunks_pandas
+    output = open_sink(args.output)
+    filtered_output = open_sink(args.filtered_output)
+    rows = kept = chunks = 0
+    try:
+        for chunk in reader(args.input, args.chunksize):
+            modified, filtered = transform(chunk)
+            if output:
+                output.write(modified)
+            if filtered_output:
+                filtered_output.write(filtered)
+            rows += len(modified)
+            kept += len(filtered)
+            chunks += 1
+            if args.verbose:
+                print(f"chunk {chunks}: {rows} rows, peak {peak_memory_mb():.0f} MB", file=sys.stderr)
+    finally:
+        for sink in (output, filtered_output):
+            if sink:
+                sink.close()
+    elapsed = time.perf_counter() - started
+    print(f"Rows: {rows}, filtered (Age > 25): {kept}, chunks: {chunks}")
+    print(f"Time: {elapsed:.2f} s ({rows / elapsed if elapsed else 0:,.0f} rows/s), "
+          f"peak memory: {peak_memory_mb():.0f} MB")
+
+
+def run_in_memory(args):
+    started = time.perf_counter()
+    df = pd.read_csv(args.input, dtype=DTYPES)
+    print("Original DataFrame:")
+    print(df)
+    df, filtered_df = transform(df)
+    print("\nModified DataFrame:")
+    print(df)
+    print("\nFiltered DataFrame (Age > 25):")
+    print(filtered_df)
+    output = open_sink(args.output)
+    output.write(df)
+    output.close()
+    if args.filtered_output:
+        filtered = open_sink(args.filtered_output)
+        filtered.write(filtered_df)
+        filtered.close()
+    print(f"\nTime: {time.perf_counter() - started:.2f} s, peak memory: {peak_memory_mb():.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive Age_Doubled and filter Age > 25")
+    parser.add_argument("input", nargs="?", default="employees_table.csv")
+    parser.add_argument("--output", default="modified_data.csv", help=".csv or .parquet")
+    parser.add_argument("--filtered-output", help="Also write the Age > 25 rows (.csv or .parquet)")
+    parser.add_argument("--stream", action="store_true", help="Process the input in chunks")
+    parser.add_argument("--chunksize", type=int, default=500000, help="Rows per chunk in --stream mode")
+    parser.add_argument("--engine", choices=("c", "pyarrow"), default="c", help="CSV parser for --stream")
+    parser.add_argument("--verbose", action="store_true", help="Report progress per chunk")
+    args = parser.parse_args()
+    if args.engine == "pyarrow" and pyarrow is None:
+        sys.exit("--engine pyarrow requires pyarrow")
+    if args.stream:
+        run_stream(args)
+    else:
+        run_in_memory(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,130 @@
 import pyttsx3
-from pydub import AudioSegment
-from pydub.playback import play
+import multiprocessing
 import os
+import shutil
+import sys
+import tempfile
 import textwrap
-
-def save_tts_chunk(text, filename, voice_id=None, rate=120, volume=1.0):
-    engine = pyttsx3.init()
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+# Chunks are synthesized in a process pool (one pyttsx3 engine per worker,
+# created once) and joined by streaming WAV frames straight into the output
+# file, so a long document takes time proportional to its length divided by
+# the number of cores. Works offline with the espeak backend on Linux.
+#
+#   python text_to_speech.py [document.txt] [--workers N] [--output out.wav]
+
+#Engine owned by each pool worker, created once in _init_worker
+_engine = None
+
+def _init_worker(voice_id, rate, volume):
+    global _engine
+    _engine = pyttsx3.init()
     if voice_id:
-        engine.setProperty('voice', voice_id)
-    engine.setProperty('rate', rate)
-    engine.setProperty('volume', volume)
-
-    engine.save_to_file(text, filename)
-    engine.runAndWait()
-
-def save_tts_chunks(text, filename_prefix="chunk", max_chars=5000, voice_id=None):
+        _engine.setProperty('voice', voice_id)
+    _engine.setProperty('rate', rate)
+    _engine.setProperty('volume', volume)
+
+def _synthesize(job):
+    text, filename = job
+    _engine.save_to_file(text, filename)
+    _engine.runAndWait()
+    return filename
+
+#Smaller chunks than the serial path keep all workers busy until the end
+def save_tts_chunks_parallel(text, directory, max_chars=1000, voice_id=None, rate=120, volume=1.0, workers=None):
     chunks = textwrap.wrap(text, max_chars)
-    files = []
-
-    for i, chunk in enumerate(chunks):
-        chunk_file = f"{filename_prefix}_{i}.wav"
-        save_tts_chunk(chunk, chunk_file, voice_id=voice_id)
-        files.append(chunk_file)
-
-    return files
-
-def concatenate_audio(files, output_file="output.wav"):
-    combined = AudioSegment.empty()
-
-    for file in files:
-        segment = AudioSegment.from_file(file)
-        combined += segment
-
-    combined.export(output_file, format="wav")
+    jobs = [(chunk, os.path.join(directory, f"chunk_{i:06d}.wav")) for i, chunk in enumerate(chunks)]
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    #spawn: never fork a process that may already hold an espeak instance
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(voice_id, rate, volume)) as pool:
+        return list(pool.map(_synthesize, jobs))
+
+#Stream frames from each chunk into the output instead of growing one buffer
+def concatenate_audio(files, output_file="output.wav", block_frames=65536):
+    if not files:
+        raise ValueError("No audio chunks to concatenate")
+    params = None
+    with wave.open(output_file, "wb") as out:
+        for file in files:
+            with wave.open(file, "rb") as chunk:
+                fmt = (chunk.getnchannels(), chunk.getsampwidth(), chunk.getframerate())
+                if params is None:
+                    params = fmt
+                    out.setnchannels(fmt[0])
+                    out.setsampwidth(fmt[1])
+                    out.setframerate(fmt[2])
+                elif fmt != params:
+                    raise ValueError(f"{file} has format {fmt}, expected {params}")
+                while True:
+                    frames = chunk.readframes(block_frames)
+                    if not frames:
+                        break
+                    out.writeframes(frames)
 
 #Fetch available voices and select a male voice
-engine = pyttsx3.init()
-voices = engine.getProperty('voices')
-male_voice_id = None
-for voice in voices:
-    if "male" in voice.name.lower():
-        male_voice_id = voice.id
-        break
-
-if not male_voice_id:
-    print("Male voice not found, using default voice.")
-
-text = """Hello User., 
+def find_male_voice():
+    engine = pyttsx3.init()
+    for voice in engine.getProperty('voices'):
+        name = voice.name.lower()
+        if "male" in name and "female" not in name:
+            return voice.id
+    return None
+
+def main(argv):
+    args = list(argv)
+    workers = None
+    output_file = "old_man_voice.wav"
+    if "--workers" in args:
+        i = args.index("--workers")
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+    if "--output" in args:
+        i = args.index("--output")
+        output_file = args[i + 1]
+        del args[i:i + 2]
+
+    if args:
+        with open(args[0], encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = """Hello User.,
 Nice meeting You......."""
 
-
-
-#Save TTS chunks with larger chunk size
-tts_files = save_tts_chunks(text, max_chars=5000, voice_id=male_voice_id)
-
-#Concatenate audio files
-output_file = "old_man_voice.wav"
-concatenate_audio(tts_files, output_file)
-
-#Check if the file was saved successfully
-if os.path.exists(output_file):
-    print(f"File {output_file} created successfully.")
-else:
-    print(f"Failed to create file {output_file}.")
-    exit()
-
-#Load the concatenated WAV file
-try:
-    sound = AudioSegment.from_file(output_file)
-    print(f"Loaded {output_file} successfully.")
-except Exception as e:
-    print(f"Error loading {output_file}: {e}")
-    exit()
-    
\ No newline at end of file
+    if not text.strip():
+        print("Nothing to synthesize: the input text is empty.")
+        sys.exit(1)
+
+    male_voice_id = find_male_voice()
+    if not male_voice_id:
+        print("Male voice not found, using default voice.")
+
+    started = time.perf_counter()
+    directory = tempfile.mkdtemp(prefix="tts_")
+    try:
+        tts_files = save_tts_chunks_parallel(text, directory, voice_id=male_voice_id, workers=workers)
+        concatenate_audio(tts_files, output_file)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    #Check if the file was saved successfully
+    if not os.path.exists(output_file):
+        print(f"Failed to create file {output_file}.")
+        sys.exit(1)
+
+    try:
+        with wave.open(output_file, "rb") as sound:
+            duration = sound.getnframes() / sound.getframerate()
+    except Exception as e:
+        print(f"Error loading {output_file}: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    print(f"File {output_file} created successfully: {len(text)} chars, "
+          f"{duration:.1f} s of audio in {elapsed:.1f} s using {len(tts_files)} chunks.")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+# Compare interpreter startup import cost (python -X importtime) of the cron
+# path (anamoly-build/bin/main.py) and the one-shot path
+# (vmalert-clone/python_alert.py) with lazy plugins against the old behaviour
+# of importing the backends up front. "eager" adds exactly the backend imports
+# the pre-registry scripts had, so backends added since do not inflate the
+# saving. A scenario whose import fails (e.g. a missing dependency) is skipped.
+#
+#   python bin/bench_importtime.py [runs]
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+repo_root = os.path.dirname(project_root)
+
+# Backend imports of the pre-registry scripts
+CRON_EAGER_BACKENDS = ["libs.prometheus_query", "libs.victoria_export"]
+ONE_SHOT_EAGER_BACKENDS = ["mysql.connector", "requests"]
+
+SCENARIOS = {
+    "cron (anamoly-build)": (
+        project_root,
+        "import runpy; runpy.run_path('bin/main.py', run_name='bench')",
+        "import " + ", ".join(CRON_EAGER_BACKENDS),
+    ),
+    "one-shot (vmalert-clone)": (
+        os.path.join(repo_root, "vmalert-clone"),
+        "import python_alert",
+        "import " + ", ".join(ONE_SHOT_EAGER_BACKENDS),
+    ),
+}
+
+
+# Run one import under -X importtime and return (total self time ms, modules),
+# or raise RuntimeError if the import failed
+def measure(cwd, code):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or [""]
+        raise RuntimeError(f"exited {proc.returncode}: {tail[0]}")
+    total_us = 0
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        modules.add(name.strip())
+    return total_us / 1000.0, modules
+
+
+def best_of(runs, cwd, code):
+    results = [measure(cwd, code) for _ in range(runs)]
+    return min(results, key=lambda r: r[0])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, (cwd, lazy_code, eager_extra) in SCENARIOS.items():
+        print(f"{name}:")
+        try:
+            lazy_ms, lazy_mods = best_of(runs, cwd, lazy_code)
+            eager_ms, eager_mods = best_of(runs, cwd, lazy_code + "\n" + eager_extra)
+        except RuntimeError as e:
+            print(f"  skipped: {e}")
+            continue
+        saved = eager_ms - lazy_ms
+        print(f"  lazy : {lazy_ms:8.1f} ms  {len(lazy_mods):4d} modules  mysql loaded: {'mysql' in lazy_mods}")
+        print(f"  eager: {eager_ms:8.1f} ms  {len(eager_mods):4d} modules  mysql loaded: {'mysql' in eager_mods}")
+        print(f"  saved: {saved:8.1f} ms ({saved / eager_ms * 100 if eager_ms else 0:.0f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+from libs.history import HistoryReader, HistoryWriter
+
+# Query the local alert history store (see libs/history.py), e.g.
+#
+#   python bin/history.py count --rule cpu_usage --since 2026-09-01 --until 2026-09-30
+#   python bin/history.py count --by day --since 2026-09-01
+#   python bin/history.py count --rule cpu_usage --by label:instance
+#   python bin/history.py stats --rule cpu_usage --since 2026-09-01
+#   python bin/history.py tail --rule cpu_usage -n 20
+#   python bin/history.py import alerts.jsonl    # JSON lines from export_to_file
+
+
+# Accept YYYY-MM-DD, an ISO timestamp or unix seconds
+def parse_time(text, end_of_day=False):
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    if end_of_day and len(text) == 10:
+        return parsed.timestamp() + 86400 - 0.001
+    return parsed.timestamp()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query the local alert history store")
+    parser.add_argument("--path", default="history", help="history root directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("count", "stats", "tail"):
+        command = commands.add_parser(name)
+        command.add_argument("--rule")
+        command.add_argument("--since")
+        command.add_argument("--until")
+        if name == "count":
+            command.add_argument("--by", default="rule", help="rule | day | label:<name>")
+        if name == "tail":
+            command.add_argument("-n", type=int, default=20)
+
+    command = commands.add_parser("import")
+    command.add_argument("file", help="JSON lines written by export_to_file")
+    return parser.parse_args()
+
+
+def import_file(root, path):
+    writer = HistoryWriter(root, flush_rows=100000)
+    rows = 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            alert = json.loads(line)
+            ts = parse_time(alert["timestamp"])
+            writer.append(alert["name"], alert.get("labels", {}), alert["value"], ts)
+            rows += 1
+    writer.flush()
+    return rows
+
+
+def main():
+    args = parse_args()
+    began = time.perf_counter()
+    if args.command == "import":
+        print(f"imported {import_file(args.path, args.file)} events")
+    else:
+        reader = HistoryReader(args.path)
+        since, until = parse_time(args.since), parse_time(args.until, end_of_day=True)
+        if args.command == "count":
+            totals = reader.count(args.rule, since, until, args.by)
+            for key, n in sorted(totals.items(), key=lambda kv: (-kv[1], kv[0])):
+                print(f"{n:12d}  {key}")
+            print(f"{sum(totals.values()):12d}  total")
+        elif args.command == "stats":
+            print(json.dumps(reader.value_stats(args.rule, since, until)))
+        else:
+            for event in reader.events(args.rule, since, until, args.n):
+                print(json.dumps(event))
+    print(f"({(time.perf_counter() - began) * 1000:.1f} ms)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
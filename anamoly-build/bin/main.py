@@ -6,41 +6,90 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
 # Add the full path to the libs directory
 sys.path.append(os.path.join(project_root))
-from libs.config_loader import load_config
-from libs.prometheus_query import query_prometheus
-# from libs.mysql_exporter import export_to_mysql
-# from libs.file_exporter import export_to_file
-from libs.victoria_export import export_to_victoriametrics
+from libs.config_loader import load_config, iter_rules
+from libs.registry import load_source
+from libs.series import rotate_symbols
+from libs.sinks import SinkPipeline
+from libs.tenants import TenantQuotas, run_fair
+from libs import cardinality
+from libs import planner
+from libs import tracing
 import logging
+import time
 
 logging.basicConfig(level=logging.INFO)
 
+def evaluate_rule(rule, tenant, datasources, pipeline):
+    with tracing.trace("rule", rule=rule["name"], tenant=tenant):
+        datasource = datasources.get(rule["datasource"]["name"], {})
+        source_type = "incremental" if rule.get("incremental") else datasource.get("type", "prometheus")
+        source = load_source(source_type)
+        if source is None:
+            logging.error(f"Unknown datasource type {source_type} in rule {rule['name']}")
+            return
+        with tracing.span("query"):
+            series = source(rule=rule, datasources=datasources, tenant=tenant)
+        if series is None:
+            return
+
+        threshold = rule["threshold"]
+        condition = rule["condition"]
+        
+        # Evaluate every returned series; export only the breaching ones
+        with tracing.span("evaluate", series=len(series)):
+            breaching = series.select(series.compare(condition, threshold))
+        if len(breaching):
+            value = breaching.values[0]
+            logging.info(f"Rule triggered: {rule['name']} (tenant {tenant}) with value {value} ({len(breaching)}/{len(series)} series)")
+            with tracing.span("dispatch"):
+                pipeline.dispatch(rule, value, tenant, breaching)
+        else:
+            logging.info(f"Rule not triggered: {rule['name']} (tenant {tenant}) over {len(series)} series")
+
+def run_pass(config, datasources, quotas, workers, pipeline):
+    cardinality.new_pass()
+    rotate_symbols((config.get("limits") or {}).get("max_symbols"))
+    # Process each rule once per tenant, sharing the worker pool fairly
+    jobs = [
+        (tenant, lambda rule=rule, tenant=tenant: tracing.profiled(evaluate_rule, rule, tenant, datasources, pipeline))
+        for rule, tenant in iter_rules(config)
+    ]
+    run_fair(jobs, quotas, workers)
+    cardinality.report()
+    planner.report()
+    pipeline.report()
+
 def main():
     # Load config
     config = load_config("config/rules.yaml")
     datasources = config.get("datasources", {})
     exports = config.get("exports", {})
+    quotas = TenantQuotas(config.get("quotas"))
+    evaluation = config.get("evaluation", {})
+    workers = evaluation.get("workers", 8)
+    interval = evaluation.get("interval")
+    drain_timeout = evaluation.get("drain_timeout")
+    pipeline = SinkPipeline(exports)
+    cardinality.configure(config.get("limits"))
+    planner.configure(config.get("planner"))
+    tracing.configure(config.get("tracing"))
+    tracing.configure_profiling(config.get("profiling"))
     
-    # Process each rule
-    for rule in config.get("rules", []):
-        value = query_prometheus(rule, datasources)
-        if value is None:
-            continue
-
-        threshold = rule["threshold"]
-        condition = rule["condition"]
-        
-        if (condition == ">" and value > threshold) or (condition == "<" and value < threshold):
-            logging.info(f"Rule triggered: {rule['name']} with value {value}")
-            export_to_victoriametrics(rule, value, exports)
-            # export_type = rule["export"]["datastore"]
-            # if export_type == "mysql":
-            # #     export_to_mysql(rule, value, exports)
-            # # elif export_type == "file":
-            # #     export_to_file(rule, value)
-            # else:          
-        else:
-            logging.info(f"Rule not triggered: {rule['name']} with value {value}")
+    try:
+        # With evaluation.interval set, keep evaluating (and keep incremental
+        # window state) instead of exiting after one pass
+        while True:
+            started = time.monotonic()
+            run_pass(config, datasources, quotas, workers, pipeline)
+            if not interval:
+                break
+            time.sleep(max(0, interval - (time.monotonic() - started)))
+    finally:
+        # Drain every sink queue before exiting; a sink still busy after
+        # drain_timeout seconds is abandoned so a hung export cannot keep the
+        # process alive
+        pipeline.close(drain_timeout)
+        tracing.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,58 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+from libs.config_loader import load_config
+from libs import range_cache
+
+logging.basicConfig(level=logging.INFO)
+
+# Run a range query through the step-aligned results cache, e.g. for backfills
+# and rule tuning:
+#
+#   python bin/query_range.py 'rate(http_requests_total[5m])' --hours 24 --step 60
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cached query_range against a configured datasource")
+    parser.add_argument("expr")
+    parser.add_argument("--config", default="config/rules.yaml")
+    parser.add_argument("--datasource", default=None, help="datasource name (default: first configured)")
+    parser.add_argument("--tenant", default="0")
+    parser.add_argument("--start", type=float, default=None, help="unix seconds (default: end - hours)")
+    parser.add_argument("--end", type=float, default=None, help="unix seconds (default: now)")
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--step", type=int, default=60)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--output", default=None, help="write the merged result JSON here")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = load_config(args.config)
+    datasources = config.get("datasources", {})
+    name = args.datasource or next(iter(datasources))
+    end = args.end or time.time()
+    start = args.start or end - args.hours * 3600
+
+    cache = None if args.no_cache else range_cache.from_config(config.get("range_cache"))
+    began = time.perf_counter()
+    results = range_cache.query_range(datasources[name], args.expr, start, end, args.step, args.tenant, cache)
+    elapsed = time.perf_counter() - began
+
+    points = sum(len(r.get("values", [])) for r in results)
+    print(f"{len(results)} series, {points} points in {elapsed:.3f}s")
+    if cache is not None:
+        print(f"cache: {cache.stats()}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f)
+
+if __name__ == "__main__":
+    main()
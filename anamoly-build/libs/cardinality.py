@@ -0,0 +1,186 @@
+import heapq
+import logging
+import math
+import random
+import threading
+
+# Series limits for query results, enforced while the response is consumed so
+# a runaway `expr` never materialises millions of series.
+#
+#   limits:                      # global defaults
+#     max_series: 10000          # per rule
+#     max_series_per_pass: 100000
+#     mode: topk                 # topk (closest to breaching) | sample | abort
+#
+# Rules may override `limits.max_series` / `limits.mode`.
+
+MODES = ("topk", "sample", "abort")
+
+_defaults = {}
+_budget = None
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class CardinalityError(Exception):
+    pass
+
+
+# Shared series budget for one evaluation pass across every rule and tenant
+class PassBudget:
+    def __init__(self, max_series=None):
+        self.max_series = max_series
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        if self.max_series is None:
+            return None
+        with self.lock:
+            return max(0, self.max_series - self.used)
+
+    # Claim up to n series; returns how many were granted
+    def claim(self, n):
+        if self.max_series is None:
+            return n
+        with self.lock:
+            granted = max(0, min(n, self.max_series - self.used))
+            self.used += granted
+            return granted
+
+
+def configure(settings):
+    global _defaults
+    _defaults = dict(settings or {})
+    new_pass()
+
+
+# Start a new evaluation pass: resets the global budget and the counters
+def new_pass():
+    global _budget
+    _budget = PassBudget(_defaults.get("max_series_per_pass"))
+    with _stats_lock:
+        _stats.clear()
+
+
+def _value(series):
+    sample = series.get("value") or (series.get("values") or [[0, "nan"]])[-1]
+    try:
+        return float(sample[1])
+    except (TypeError, ValueError, IndexError):
+        return math.nan
+
+
+# Ranking key for topk: higher means closer to breaching `condition threshold`,
+# so a capped result keeps the series most likely to fire (the highest values
+# for > / >=, the lowest for < / <=, the nearest to the threshold for ==).
+# Without a condition the highest values are kept.
+def _rank(value, condition=None, threshold=None):
+    if math.isnan(value):
+        return -math.inf
+    if condition in ("<", "<="):
+        return -value
+    if condition in ("==", "!=") and threshold is not None:
+        distance = abs(value - threshold)
+        return -distance if condition == "==" else distance
+    return value
+
+
+# Bounded collector for one rule's result set
+class SeriesGuard:
+    def __init__(self, name, max_series=None, mode="topk", budget=None, condition=None, threshold=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cardinality mode {mode}")
+        self.name = name
+        self.budget = budget
+        limit = max_series
+        remaining = budget.remaining() if budget is not None else None
+        if remaining is not None:
+            limit = remaining if limit is None else min(limit, remaining)
+        self.limit = limit
+        self.mode = mode
+        self.condition = condition
+        self.threshold = threshold
+        self.seen = 0
+        self.kept = []
+        self._seq = 0
+
+    def offer(self, series):
+        self.seen += 1
+        if self.limit is None or len(self.kept) < self.limit:
+            if self.mode == "topk":
+                heapq.heappush(self.kept, (self._rank(series), self._seq, series))
+                self._seq += 1
+            else:
+                self.kept.append(series)
+            return
+        if self.mode == "abort":
+            raise CardinalityError(
+                f"rule {self.name} returned more than {self.limit} series"
+            )
+        if self.limit == 0:
+            return
+        if self.mode == "topk":
+            heapq.heappushpop(self.kept, (self._rank(series), self._seq, series))
+            self._seq += 1
+        else:
+            # Reservoir sampling: every series seen so far is kept with equal probability
+            slot = random.randrange(self.seen)
+            if slot < self.limit:
+                self.kept[slot] = series
+
+    def _rank(self, series):
+        return _rank(_value(series), self.condition, self.threshold)
+
+    # Kept series (topk: closest to breaching first), trimmed to what the pass budget grants
+    def result(self):
+        if self.mode == "topk":
+            series = [entry[2] for entry in sorted(self.kept, key=lambda e: (-e[0], e[1]))]
+        else:
+            series = list(self.kept)
+        if self.budget is not None:
+            series = series[:self.budget.claim(len(series))]
+        record(self.name, self.seen, len(series))
+        return series
+
+
+def guard_for(rule):
+    limits = rule.get("limits", {}) or {}
+    try:
+        threshold = float(rule.get("threshold"))
+    except (TypeError, ValueError):
+        threshold = None
+    return SeriesGuard(
+        rule["name"],
+        max_series=limits.get("max_series", _defaults.get("max_series")),
+        mode=limits.get("mode", _defaults.get("mode", "topk")),
+        budget=_budget,
+        condition=rule.get("condition"),
+        threshold=threshold,
+    )
+
+
+def record(name, seen, kept, aborted=False):
+    with _stats_lock:
+        entry = _stats.setdefault(name, {"seen": 0, "kept": 0, "aborted": 0})
+        entry["seen"] += seen
+        entry["kept"] += kept
+        entry["aborted"] += int(aborted)
+
+
+def stats():
+    with _stats_lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
+
+
+# Log series seen versus kept for every rule that had to be limited
+def report():
+    total_seen = total_kept = 0
+    for name, entry in stats().items():
+        total_seen += entry["seen"]
+        total_kept += entry["kept"]
+        if entry["seen"] > entry["kept"] or entry["aborted"]:
+            logging.warning(
+                f"Cardinality limit hit for {name}: seen {entry['seen']}, kept {entry['kept']}, aborted {entry['aborted']}"
+            )
+    logging.info(f"Series seen {total_seen}, kept {total_kept}")
@@ -1,5 +1,30 @@
 import yaml
 
+from libs.tenants import DEFAULT_TENANT
+
 def load_config(path):
     with open(path, 'r') as f:
         return yaml.safe_load(f)
+
+
+# Tenants a rule or group applies to: `tenants` (list) wins over `tenant`.
+def _tenants_of(entry, default):
+    if entry.get("tenants"):
+        return [str(t) for t in entry["tenants"]]
+    if entry.get("tenant") is not None:
+        return [str(entry["tenant"])]
+    return default
+
+
+# Expand the config into (rule, tenant) pairs. Top-level `rules` and rules
+# inside `groups` are both supported; rules inherit their group's tenants.
+def iter_rules(config):
+    default = _tenants_of(config, [DEFAULT_TENANT])
+    for rule in config.get("rules", []):
+        for tenant in _tenants_of(rule, default):
+            yield rule, tenant
+    for group in config.get("groups", []):
+        group_tenants = _tenants_of(group, default)
+        for rule in group.get("rules", []):
+            for tenant in _tenants_of(rule, group_tenants):
+                yield rule, tenant
@@ -0,0 +1,439 @@
+import fcntl
+import heapq
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from libs.tenants import DEFAULT_TENANT
+
+# Local alert history store.
+#
+# Events are stored in daily partitions (<root>/dt=YYYY-MM-DD/), each holding
+# one fixed-width file per column:
+#
+#   ts.u32      milliseconds since the partition's midnight (UTC)
+#   rule.u32    id into dict.json "rules"
+#   labels.u32  id into dict.json "labelsets" (canonical JSON of the label set)
+#   value.f64   alert value
+#
+# Rule names and label sets are dictionary encoded, so an event costs 20 bytes
+# regardless of how many labels it carries. Columns are little-endian. Queries
+# prune partitions by date (and by rule, when the rule never fired that day),
+# then read columns through mmap without parsing anything. numpy is used for
+# the scans when installed.
+#
+# Several writers may share a root (the history sink, `bin/history.py import`,
+# overlapping cron runs): each flush holds the partition's dict.lock, merges
+# its new names into the dict.json on disk and renumbers its buffered rows
+# before appending them.
+
+COLUMNS = (("ts", "I"), ("rule", "I"), ("labels", "I"), ("value", "d"))
+
+
+def _partition_name(day):
+    return f"dt={day.isoformat()}"
+
+
+def _day_of(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).date()
+
+
+def _midnight(day):
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+
+
+class Partition:
+    def __init__(self, root, day):
+        self.day = day
+        self.path = os.path.join(root, _partition_name(day))
+        self.rules = []
+        self.labelsets = []
+        self.rule_ids = {}
+        self.labelset_ids = {}
+        saved = self._load_dict()
+        if saved is not None:
+            self.rules = saved["rules"]
+            self.labelsets = saved["labelsets"]
+            self.rule_ids = {name: i for i, name in enumerate(self.rules)}
+            self.labelset_ids = {key: i for i, key in enumerate(self.labelsets)}
+
+    def _load_dict(self):
+        dict_path = os.path.join(self.path, "dict.json")
+        if not os.path.exists(dict_path):
+            return None
+        with open(dict_path) as f:
+            return json.load(f)
+
+    def rule_id(self, name):
+        rid = self.rule_ids.get(name)
+        if rid is None:
+            rid = self.rule_ids[name] = len(self.rules)
+            self.rules.append(name)
+        return rid
+
+    def labelset_id(self, labels):
+        key = json.dumps(labels, sort_keys=True, separators=(",", ":"))
+        lid = self.labelset_ids.get(key)
+        if lid is None:
+            lid = self.labelset_ids[key] = len(self.labelsets)
+            self.labelsets.append(key)
+        return lid
+
+    # Exclusive lock on the partition, held by a writer for a whole flush
+    def lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        f = open(os.path.join(self.path, "dict.lock"), "a")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    # Re-read dict.json (other writers may have extended it) and append the
+    # names only this writer knows. Returns old id -> merged id maps for the
+    # rule and label set columns. Call with the partition locked.
+    def merge_dict(self):
+        saved = self._load_dict() or {"rules": [], "labelsets": []}
+        rules, rule_map = _merge(saved["rules"], self.rules)
+        labelsets, labelset_map = _merge(saved["labelsets"], self.labelsets)
+        changed = len(rules) > len(saved["rules"]) or len(labelsets) > len(saved["labelsets"])
+        self.rules, self.labelsets = rules, labelsets
+        self.rule_ids = {name: i for i, name in enumerate(rules)}
+        self.labelset_ids = {key: i for i, key in enumerate(labelsets)}
+        if changed:
+            self.save_dict()
+        return rule_map, labelset_map
+
+    def save_dict(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, "dict.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"rules": self.rules, "labelsets": self.labelsets}, f)
+        os.replace(tmp, os.path.join(self.path, "dict.json"))
+
+
+# Entries of `saved` keep their ids; names only in `local` are appended.
+# Returns the merged list and a local id -> merged id map.
+def _merge(saved, local):
+    merged = list(saved)
+    ids = {name: i for i, name in enumerate(merged)}
+    mapping = array("I")
+    for name in local:
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(merged)
+            merged.append(name)
+        mapping.append(i)
+    return merged, mapping
+
+
+def _renumber(column, mapping):
+    if all(i == new for i, new in enumerate(mapping)):
+        return column
+    return array("I", (mapping[i] for i in column))
+
+
+# Appends events to the store. Rows are buffered per partition and flushed as
+# whole column appends under the partition lock; the merged dictionary is
+# written before the rows that use it.
+class HistoryWriter:
+    def __init__(self, root, flush_rows=1000):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.partitions = {}
+        self.buffers = {}
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def _partition(self, day):
+        partition = self.partitions.get(day)
+        if partition is None:
+            partition = self.partitions[day] = Partition(self.root, day)
+            self.buffers[day] = {name: array(code) for name, code in COLUMNS}
+        return partition
+
+    def append(self, rule_name, labels, value, ts=None):
+        ts = time.time() if ts is None else ts
+        day = _day_of(ts)
+        with self.lock:
+            partition = self._partition(day)
+            columns = self.buffers[day]
+            columns["ts"].append(int((ts - _midnight(day)) * 1000))
+            columns["rule"].append(partition.rule_id(rule_name))
+            columns["labels"].append(partition.labelset_id(labels))
+            columns["value"].append(float(value))
+            self.pending += 1
+            if self.pending >= self.flush_rows:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        for day, partition in self.partitions.items():
+            columns = self.buffers[day]
+            if not len(columns["ts"]):
+                continue
+            with partition.lock():
+                rule_map, labelset_map = partition.merge_dict()
+                columns["rule"] = _renumber(columns["rule"], rule_map)
+                columns["labels"] = _renumber(columns["labels"], labelset_map)
+                for name, code in COLUMNS:
+                    column = columns[name]
+                    if sys.byteorder != "little":
+                        column.byteswap()
+                    with open(os.path.join(partition.path, f"{name}.{_suffix(code)}"), "ab") as f:
+                        column.tofile(f)
+                    self.buffers[day][name] = array(code)
+        self.pending = 0
+        # Only today's and yesterday's partitions still receive events
+        cutoff = _day_of(time.time()) - timedelta(days=1)
+        for day in [d for d in self.partitions if d < cutoff]:
+            del self.partitions[day]
+            del self.buffers[day]
+
+
+def _suffix(code):
+    return {"I": "u32", "d": "f64"}[code]
+
+
+def _load_column(path, code):
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return memoryview(array(code))
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        size -= size % array(code).itemsize
+        if size == 0:
+            return memoryview(array(code))
+        mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+    view = memoryview(mapped).cast(code)
+    if sys.byteorder != "little":
+        view = array(code, view)
+        view.byteswap()
+        view = memoryview(view)
+    return view
+
+
+# Read side: partition pruning plus column scans
+class HistoryReader:
+    def __init__(self, root):
+        self.root = root
+
+    def days(self, since=None, until=None, newest_first=False):
+        if not os.path.isdir(self.root):
+            return []
+        days = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.startswith("dt="):
+                continue
+            day = datetime.strptime(name[3:], "%Y-%m-%d").date()
+            if (since is None or day >= _day_of(since)) and (until is None or day <= _day_of(until)):
+                days.append(day)
+        return days[::-1] if newest_first else days
+
+    # Memory-mapped columns of one partition, trimmed to the rows every column has
+    def columns(self, day):
+        partition = Partition(self.root, day)
+        columns = {
+            name: _load_column(os.path.join(partition.path, f"{name}.{_suffix(code)}"), code)
+            for name, code in COLUMNS
+        }
+        rows = min(len(c) for c in columns.values())
+        return partition, {name: c[:rows] for name, c in columns.items()}
+
+    # Yield (partition, columns, row mask or None) for partitions that can match
+    def scan(self, rule=None, since=None, until=None, newest_first=False):
+        for day in self.days(since, until, newest_first):
+            partition, columns = self.columns(day)
+            rule_id = None
+            if rule is not None:
+                rule_id = partition.rule_ids.get(rule)
+                if rule_id is None:
+                    continue
+            start = end = None
+            midnight = _midnight(day)
+            if since is not None and since > midnight:
+                start = int((since - midnight) * 1000)
+            if until is not None and until < midnight + 86400:
+                end = int((until - midnight) * 1000)
+            yield partition, columns, _select(columns, rule_id, start, end)
+
+    def count(self, rule=None, since=None, until=None, by="rule"):
+        totals = Counter()
+        for partition, columns, rows in self.scan(rule, since, until):
+            if by == "day":
+                totals[partition.day.isoformat()] += _count(rows, columns["rule"])
+            elif by == "rule":
+                for rid, n in _group_count(columns["rule"], rows).items():
+                    totals[partition.rules[rid]] += n
+            elif by.startswith("label:"):
+                key = by[len("label:"):]
+                for lid, n in _group_count(columns["labels"], rows).items():
+                    totals[json.loads(partition.labelsets[lid]).get(key, "")] += n
+            else:
+                raise ValueError(f"Unknown grouping {by}")
+        return totals
+
+    def value_stats(self, rule=None, since=None, until=None):
+        count, total, low, high = 0, 0.0, None, None
+        for _, columns, rows in self.scan(rule, since, until):
+            values = _values(columns["value"], rows)
+            if not len(values):
+                continue
+            part_total, part_low, part_high = _summary(values)
+            count += len(values)
+            total += part_total
+            low = part_low if low is None else min(low, part_low)
+            high = part_high if high is None else max(high, part_high)
+        return {"count": count, "avg": total / count if count else None, "min": low, "max": high}
+
+    # With a limit, partitions are read newest first and only the latest rows
+    # of each are decoded, stopping once `limit` events are collected
+    def events(self, rule=None, since=None, until=None, limit=None):
+        out = []
+        for partition, columns, rows in self.scan(rule, since, until, newest_first=bool(limit)):
+            midnight = _midnight(partition.day)
+            if limit:
+                indices = _latest(columns["ts"], rows, limit - len(out))
+            else:
+                indices = range(len(columns["ts"])) if rows is None else _indices(rows)
+            for i in indices:
+                out.append({
+                    "timestamp": midnight + columns["ts"][i] / 1000.0,
+                    "name": partition.rules[columns["rule"][i]],
+                    "labels": json.loads(partition.labelsets[columns["labels"][i]]),
+                    "value": columns["value"][i],
+                })
+            if limit and len(out) >= limit:
+                break
+        out.sort(key=lambda e: e["timestamp"])
+        return out
+
+
+def _numpy():
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+
+# Row selection for a partition: None means every row. With numpy this is a
+# boolean mask; otherwise a list of row indices.
+def _select(columns, rule_id, start, end):
+    if rule_id is None and start is None and end is None:
+        return None
+    np = _numpy()
+    if np is not None:
+        mask = np.ones(len(columns["ts"]), dtype=bool)
+        ts = np.frombuffer(columns["ts"], dtype=np.uint32)
+        if rule_id is not None:
+            mask &= np.frombuffer(columns["rule"], dtype=np.uint32) == rule_id
+        if start is not None:
+            mask &= ts >= start
+        if end is not None:
+            mask &= ts <= end
+        return mask
+    ts, rule_col = columns["ts"], columns["rule"]
+    return [
+        i for i in range(len(ts))
+        if (rule_id is None or rule_col[i] == rule_id)
+        and (start is None or ts[i] >= start)
+        and (end is None or ts[i] <= end)
+    ]
+
+
+def _indices(rows):
+    np = _numpy()
+    if np is not None and isinstance(rows, np.ndarray):
+        return np.nonzero(rows)[0].tolist()
+    return rows
+
+
+# Indices of the `k` latest selected rows of a partition
+def _latest(ts, rows, k):
+    np = _numpy()
+    if np is not None:
+        stamps = np.frombuffer(ts, dtype=np.uint32)
+        indices = np.arange(len(stamps)) if rows is None else np.nonzero(rows)[0]
+        order = np.argsort(stamps[indices], kind="stable")
+        return indices[order[-k:]].tolist()
+    indices = range(len(ts)) if rows is None else rows
+    return heapq.nlargest(k, indices, key=lambda i: (ts[i], i))
+
+
+def _count(rows, column):
+    if rows is None:
+        return len(column)
+    np = _numpy()
+    if np is not None and isinstance(rows, np.ndarray):
+        return int(rows.sum())
+    return len(rows)
+
+
+def _group_count(column, rows):
+    np = _numpy()
+    if np is not None:
+        ids = np.frombuffer(column, dtype=np.uint32)
+        if rows is not None:
+            ids = ids[rows]
+        counts = np.bincount(ids)
+        return {int(i): int(counts[i]) for i in np.nonzero(counts)[0]}
+    if rows is None:
+        return Counter(column)
+    return Counter(column[i] for i in rows)
+
+
+def _values(column, rows):
+    np = _numpy()
+    if np is not None:
+        values = np.frombuffer(column, dtype=np.float64)
+        return values if rows is None else values[rows]
+    if rows is None:
+        return column
+    return [column[i] for i in rows]
+
+
+# (sum, min, max) of a non-empty value selection
+def _summary(values):
+    np = _numpy()
+    if np is not None and isinstance(values, np.ndarray):
+        return float(values.sum()), float(values.min()), float(values.max())
+    return float(sum(values)), min(values), max(values)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(root):
+    with _writers_lock:
+        writer = _writers.get(root)
+        if writer is None:
+            writer = _writers[root] = HistoryWriter(root)
+        return writer
+
+
+# Sink plugin: one event per breaching series (or one for the rule when the
+# source returned no series), labelled with the tenant
+def export_to_history(rule, value, exports, tenant=DEFAULT_TENANT, series=None):
+    settings = exports.get("history", {}) or {}
+    writer = get_writer(settings.get("path", "history"))
+    base = dict(rule.get("labels", {}) or {})
+    base["tenant"] = str(tenant)
+    if series is not None and len(series):
+        for i in range(len(series)):
+            labels = series.label_dict(i)
+            labels.update(base)
+            writer.append(rule["name"], labels, series.values[i])
+    else:
+        writer.append(rule["name"], base, value)
+    writer.flush()
+    logging.info(f"Exported to history: {rule['name']}")
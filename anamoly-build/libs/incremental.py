@@ -0,0 +1,176 @@
+import logging
+import math
+import re
+import threading
+import time
+from collections import deque
+
+from libs import cardinality
+from libs.prometheus_query import fetch_results, query_series
+from libs.series import SeriesSet, symbols
+from libs.tenants import DEFAULT_TENANT
+
+# Incremental evaluation of simple window functions:
+#
+#   rate(<selector>[<window>]), increase(...), avg_over_time(...)
+#
+# Instead of asking vmselect to rescan the whole window every pass, each series
+# keeps a ring buffer of its raw samples and only samples newer than the last
+# fetch are requested (as `<selector>[<since>]` at time=now). The window
+# function is then computed locally. rate/increase follow VictoriaMetrics
+# semantics: the last sample before the window is used as the base, counter
+# resets add the post-reset value, and no extrapolation is applied.
+#
+# Enable per rule with `incremental: true`. State lives in the process, so the
+# saving applies when main runs with evaluation.interval; a one-shot run just
+# fetches the full window once. Anything not matching the simple form falls
+# back to a normal query.
+
+_EXPR = re.compile(
+    r"^\s*(?P<func>rate|increase|avg_over_time)\(\s*(?P<selector>[a-zA-Z_:][\w:]*\s*(\{[^{}]*\})?|\{[^{}]*\})"
+    r"\s*\[(?P<window>\d+[smhdw])\]\s*\)\s*$"
+)
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# Overlap added to each incremental fetch so late-arriving samples are not missed
+OVERLAP_SECONDS = 15
+MAX_SAMPLES = 10000
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def parse(expr):
+    match = _EXPR.match(expr)
+    if not match:
+        return None
+    window = match.group("window")
+    return match.group("func"), match.group("selector").strip(), int(window[:-1]) * _UNITS[window[-1]]
+
+
+class WindowState:
+    def __init__(self, func, selector, window):
+        self.func = func
+        self.selector = selector
+        self.window = window
+        self.buffers = {}
+        self.last_seen = {}
+        self.last_fetch = None
+        self.symbols = symbols()
+        self.lock = threading.Lock()
+
+    # Buffers are keyed by label ids; move them over when the process-wide
+    # symbol table has been rotated
+    def remap(self, table):
+        old = self.symbols
+
+        def convert(label_ids):
+            return tuple(table.intern(old.lookup(sid)) for sid in label_ids)
+
+        self.buffers = {convert(k): v for k, v in self.buffers.items()}
+        self.last_seen = {convert(k): v for k, v in self.last_seen.items()}
+        self.symbols = table
+
+    # Add new raw samples for a series, skipping ones already buffered
+    def add(self, label_ids, samples, now):
+        buf = self.buffers.get(label_ids)
+        if buf is None:
+            buf = self.buffers[label_ids] = deque(maxlen=MAX_SAMPLES)
+        newest = buf[-1][0] if buf else -math.inf
+        for ts, value in samples:
+            ts = float(ts)
+            if ts > newest:
+                buf.append((ts, float(value)))
+                newest = ts
+        self.last_seen[label_ids] = now
+
+    # Drop samples older than the window, keeping the newest of them as the base
+    # for rate/increase; forget series not seen for a whole window
+    def evict(self, now):
+        start = now - self.window
+        for label_ids in list(self.buffers):
+            if self.last_seen.get(label_ids, 0) < start:
+                del self.buffers[label_ids]
+                self.last_seen.pop(label_ids, None)
+                continue
+            buf = self.buffers[label_ids]
+            while len(buf) > 1 and buf[1][0] <= start:
+                buf.popleft()
+
+    def compute(self, buf, now):
+        start = now - self.window
+        inside = [s for s in buf if s[0] > start]
+        if not inside:
+            return None
+        if self.func == "avg_over_time":
+            return sum(v for _, v in inside) / len(inside)
+        samples = list(buf) if buf[0][0] <= start else inside
+        if len(samples) < 2:
+            return None
+        increase = 0.0
+        prev = samples[0][1]
+        for _, value in samples[1:]:
+            increase += value - prev if value >= prev else value
+            prev = value
+        if self.func == "increase":
+            return increase
+        elapsed = samples[-1][0] - samples[0][0]
+        return increase / elapsed if elapsed > 0 else None
+
+
+def _state_for(rule, tenant, parsed):
+    key = (rule["name"], str(tenant))
+    with _states_lock:
+        state = _states.get(key)
+        if state is None or (state.func, state.selector, state.window) != parsed:
+            state = _states[key] = WindowState(*parsed)
+        return state
+
+
+# Source plugin for rules with `incremental: true`
+def query_incremental(rule, datasources, tenant=DEFAULT_TENANT):
+    parsed = parse(rule["query"])
+    if parsed is None:
+        logging.debug(f"Rule {rule['name']} is not a simple window function, querying normally")
+        return query_series(rule, datasources, tenant)
+
+    state = _state_for(rule, tenant, parsed)
+    with state.lock:
+        now = time.time()
+        if state.last_fetch is None or now - state.last_fetch >= state.window:
+            lookback = state.window
+        else:
+            lookback = min(state.window, math.ceil(now - state.last_fetch) + OVERLAP_SECONDS)
+        params = {"query": f"{state.selector}[{lookback}s]", "time": f"{now:.3f}"}
+        try:
+            results = fetch_results(rule, datasources, tenant, params)
+        except cardinality.CardinalityError as e:
+            logging.error(f"Cardinality limit for rule {rule['name']} (tenant {tenant}): {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Error querying datasource for rule {rule['name']} (tenant {tenant}): {e}")
+            return None
+
+        table = symbols()
+        if state.symbols is not table:
+            state.remap(table)
+        name_id = table.intern("__name__")
+        series = SeriesSet(table)
+        for entry in results:
+            label_ids = series.intern_labels(entry.get("metric", {}))
+            state.add(label_ids, entry.get("values") or [entry["value"]], now)
+        state.last_fetch = now
+        state.evict(now)
+
+        for label_ids, buf in state.buffers.items():
+            value = state.compute(buf, now)
+            if value is None:
+                continue
+            # Window functions drop the metric name, like PromQL does
+            output_ids = tuple(
+                sid for i in range(0, len(label_ids), 2) if label_ids[i] != name_id
+                for sid in label_ids[i:i + 2]
+            )
+            series.append_ids(output_ids, now, value)
+        logging.debug(f"Rule {rule['name']}: fetched {lookback}s of samples for {len(results)} series")
+        return series
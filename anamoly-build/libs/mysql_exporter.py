@@ -1,33 +1,214 @@
 import mysql.connector
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
+import threading
 
-def export_to_mysql(rule, value, exports):
+from libs.tenants import DEFAULT_TENANT
+
+# exports.mysql.schema selects the table layout:
+#
+#   legacy  (default) a single unindexed `alerts` table, as before
+#   managed `alerts` range-partitioned by day with a (name, tenant, timestamp)
+#           index, plus `alerts_hourly` / `alerts_daily` rollups per rule and
+#           tenant maintained in the same transaction as each insert.
+#           Retention drops whole partitions.
+#
+#   mysql:
+#     schema: managed
+#     retention_days: 30           # raw events, dropped a day-partition at a time
+#     rollup_retention_days: 400   # hourly/daily rollups
+#     future_partitions: 3         # days of partitions created ahead
+
+_connections = {}
+_maintained = {}
+_lock = threading.Lock()
+
+LEGACY_TABLE = """
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255),
+        description TEXT,
+        value DOUBLE,
+        timestamp DATETIME
+    )
+"""
+
+# The partitioning column has to be part of every unique key, hence the
+# (id, timestamp) primary key
+MANAGED_TABLE = """
+    CREATE TABLE IF NOT EXISTS alerts (
+        id BIGINT NOT NULL AUTO_INCREMENT,
+        name VARCHAR(255) NOT NULL,
+        tenant VARCHAR(64) NOT NULL,
+        description TEXT,
+        value DOUBLE,
+        timestamp DATETIME NOT NULL,
+        PRIMARY KEY (id, timestamp),
+        KEY idx_alerts_name_tenant_timestamp (name, tenant, timestamp),
+        KEY idx_alerts_timestamp (timestamp)
+    )
+    PARTITION BY RANGE (TO_DAYS(timestamp)) (
+        PARTITION p_future VALUES LESS THAN MAXVALUE
+    )
+"""
+
+ROLLUP_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        name VARCHAR(255) NOT NULL,
+        tenant VARCHAR(64) NOT NULL,
+        bucket {bucket_type} NOT NULL,
+        count BIGINT NOT NULL,
+        sum DOUBLE NOT NULL,
+        min DOUBLE NOT NULL,
+        max DOUBLE NOT NULL,
+        PRIMARY KEY (name, tenant, bucket),
+        KEY idx_{table}_bucket (bucket)
+    )
+"""
+
+ROLLUP_UPSERT = """
+    INSERT INTO {table} (name, tenant, bucket, count, sum, min, max)
+    VALUES (%s, %s, %s, 1, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        count = count + 1,
+        sum = sum + VALUES(sum),
+        min = LEAST(min, VALUES(min)),
+        max = GREATEST(max, VALUES(max))
+"""
+
+
+def _connection_key(mysql_config):
+    return (mysql_config["host"], int(mysql_config.get("port", 3306)), mysql_config["user"], mysql_config["database"])
+
+
+# Reuse one connection per server/database instead of connecting per alert
+def _connect(mysql_config):
+    key = _connection_key(mysql_config)
+    conn = _connections.get(key)
+    if conn is not None:
+        try:
+            conn.ping(reconnect=True, attempts=2, delay=1)
+            return conn
+        except mysql.connector.Error:
+            _connections.pop(key, None)
+    conn = mysql.connector.connect(
+        host=mysql_config["host"],
+        port=int(mysql_config.get("port", 3306)),
+        user=mysql_config["user"],
+        password=mysql_config["password"],
+        database=mysql_config["database"]
+    )
+    _connections[key] = conn
+    return conn
+
+
+def _partition_name(day):
+    return f"p{day:%Y%m%d}"
+
+
+# Existing partitions of `alerts` as {name: upper bound (TO_DAYS value)}
+def _partitions(cursor, database):
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'alerts'
+    """, (database,))
+    return {name: bound for name, bound in cursor.fetchall() if name is not None}
+
+
+# Create the managed tables, add partitions up to future_partitions days ahead
+# and drop partitions/rollups past retention. Runs at most once a day per
+# database.
+def maintain_schema(conn, mysql_config):
+    key = _connection_key(mysql_config)
+    today = datetime.utcnow().date()
+    if _maintained.get(key) == today:
+        return
+    cursor = conn.cursor()
+    cursor.execute(MANAGED_TABLE)
+    cursor.execute(ROLLUP_TABLE.format(table="alerts_hourly", bucket_type="DATETIME"))
+    cursor.execute(ROLLUP_TABLE.format(table="alerts_daily", bucket_type="DATE"))
+
+    partitions = _partitions(cursor, mysql_config["database"])
+    if not partitions:
+        logging.warning("MySQL table alerts is not partitioned; recreate it to use schema: managed partition maintenance")
+    else:
+        # Split new day partitions off the catch-all p_future partition
+        wanted = []
+        for offset in range(int(mysql_config.get("future_partitions", 3)) + 1):
+            day = today + timedelta(days=offset)
+            if _partition_name(day) not in partitions:
+                wanted.append(day)
+        if wanted and "p_future" in partitions:
+            definitions = ", ".join(
+                f"PARTITION {_partition_name(day)} VALUES LESS THAN (TO_DAYS('{day + timedelta(days=1)}'))"
+                for day in wanted
+            )
+            cursor.execute(
+                f"ALTER TABLE alerts REORGANIZE PARTITION p_future INTO ({definitions}, "
+                f"PARTITION p_future VALUES LESS THAN MAXVALUE)"
+            )
+
+        # Retention: drop whole day partitions instead of DELETEing rows
+        cutoff = today - timedelta(days=int(mysql_config.get("retention_days", 30)))
+        cursor.execute("SELECT TO_DAYS(%s)", (cutoff,))
+        cutoff_days = cursor.fetchone()[0]
+        expired = [
+            name for name, bound in partitions.items()
+            if name != "p_future" and bound != "MAXVALUE" and int(bound) <= cutoff_days
+        ]
+        if expired:
+            cursor.execute(f"ALTER TABLE alerts DROP PARTITION {', '.join(expired)}")
+            logging.info(f"Dropped expired MySQL partitions: {', '.join(expired)}")
+
+    rollup_cutoff = today - timedelta(days=int(mysql_config.get("rollup_retention_days", 400)))
+    cursor.execute("DELETE FROM alerts_hourly WHERE bucket < %s", (rollup_cutoff,))
+    cursor.execute("DELETE FROM alerts_daily WHERE bucket < %s", (rollup_cutoff,))
+    conn.commit()
+    cursor.close()
+    _maintained[key] = today
+
+
+# The legacy table has no tenant column; managed rows and rollups are kept
+# apart per tenant
+def export_to_mysql(rule, value, exports, tenant=DEFAULT_TENANT):
     mysql_config = exports.get("mysql", {})
+    managed = mysql_config.get("schema", "legacy") == "managed"
     try:
-        conn = mysql.connector.connect(
-            host=mysql_config["host"],
-            user=mysql_config["user"],
-            password=mysql_config["password"],
-            database=mysql_config["database"]
-        )
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(255),
-                description TEXT,
-                value DOUBLE,
-                timestamp DATETIME
-            )
-        """)
-        cursor.execute("""
-            INSERT INTO alerts (name, description, value, timestamp)
-            VALUES (%s, %s, %s, %s)
-        """, (rule["name"], rule["description"], value, datetime.utcnow()))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with _lock:
+            conn = _connect(mysql_config)
+            if managed:
+                maintain_schema(conn, mysql_config)
+            cursor = conn.cursor()
+            now = datetime.utcnow()
+            if managed:
+                cursor.execute("""
+                    INSERT INTO alerts (name, tenant, description, value, timestamp)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (rule["name"], str(tenant), rule["description"], value, now))
+                # Keep the rollups current in the same transaction as the event
+                cursor.execute(ROLLUP_UPSERT.format(table="alerts_hourly"),
+                               (rule["name"], str(tenant), now.replace(minute=0, second=0, microsecond=0),
+                                value, value, value))
+                cursor.execute(ROLLUP_UPSERT.format(table="alerts_daily"),
+                               (rule["name"], str(tenant), now.date(), value, value, value))
+            else:
+                cursor.execute(LEGACY_TABLE)
+                cursor.execute("""
+                    INSERT INTO alerts (name, description, value, timestamp)
+                    VALUES (%s, %s, %s, %s)
+                """, (rule["name"], rule["description"], value, now))
+            conn.commit()
+            cursor.close()
         logging.info("Exported to MySQL")
     except Exception as e:
         logging.error(f"MySQL export error: {e}")
+        # Never leave a half-written event/rollup pair on a pooled connection
+        with _lock:
+            conn = _connections.pop(_connection_key(mysql_config), None)
+            if conn is not None:
+                try:
+                    conn.rollback()
+                    conn.close()
+                except Exception:
+                    pass
@@ -0,0 +1,174 @@
+import logging
+import re
+import threading
+
+from libs.tenants import DEFAULT_TENANT
+
+# Threshold push-down: rewrite `query` + `condition` + `threshold` into
+# `(<query>) <condition> <threshold>` so vmselect only returns breaching series
+# and the full result set is never transferred or decoded. The client-side
+# comparison in main still runs on what comes back, so a rewrite can only ever
+# shrink the response, not change which series trigger.
+#
+#   planner:
+#     pushdown: true
+#     calibrate_every: 100   # every Nth evaluation per rule/tenant runs unfiltered to measure savings
+#
+# Rules can opt out with `pushdown: false`.
+
+COMPARISONS = (">", "<", ">=", "<=", "==", "!=")
+
+# Expressions whose result is a scalar: comparing those needs `bool` and would
+# change the result type, so they are never rewritten
+_SCALAR = re.compile(r"^\s*((scalar|time|pi)\s*\(|[-+]?[\d.]+(e[-+]?\d+)?\s*$)", re.I)
+
+# Trailing `offset` / `@` modifiers, which do not change the result type
+_MODIFIERS = re.compile(r"(\s+offset\s+-?[\w.]+|\s*@\s*(start\(\)|end\(\)|[\d.]+))+\s*$", re.I)
+
+_settings = {"pushdown": True, "calibrate_every": 100}
+_stats = {}
+_lock = threading.Lock()
+
+
+def configure(settings):
+    _settings.update(settings or {})
+
+
+# True if expr already has a comparison (or set/bool modifier) outside label
+# matchers, strings and range selectors, in which case it is left alone
+def _has_comparison(expr):
+    depth_braces = depth_brackets = 0
+    quote = None
+    i = 0
+    while i < len(expr):
+        ch = expr[i]
+        if quote:
+            if ch == "\\":
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'`":
+            quote = ch
+        elif ch == "{":
+            depth_braces += 1
+        elif ch == "}":
+            depth_braces -= 1
+        elif ch == "[":
+            depth_brackets += 1
+        elif ch == "]":
+            depth_brackets -= 1
+        elif not depth_braces and not depth_brackets:
+            if ch in "<>" or expr.startswith("==", i) or expr.startswith("!=", i):
+                return True
+        i += 1
+    return re.search(r"\bbool\b", expr) is not None
+
+
+# Index of the parenthesis closing the one at expr[start], skipping strings
+def _closing(expr, start):
+    depth = 0
+    quote = None
+    i = start
+    while i < len(expr):
+        ch = expr[i]
+        if quote:
+            if ch == "\\":
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'`":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if not depth:
+                return i
+        i += 1
+    return None
+
+
+# True if expr returns a range vector (`foo[5m]`, `x[1h:1m]`, optionally
+# parenthesised or with offset/@ modifiers). Comparing one is rejected by
+# Prometheus and turned into an implicit rollup by VictoriaMetrics.
+def _is_range(expr):
+    expr = _MODIFIERS.sub("", expr.strip())
+    while expr.startswith("(") and _closing(expr, 0) == len(expr) - 1:
+        expr = _MODIFIERS.sub("", expr[1:-1].strip())
+    return expr.endswith("]")
+
+
+def _threshold(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return repr(int(number)) if number.is_integer() else repr(number)
+
+
+# Return (query to send, pushed_down) for a rule
+def plan(rule):
+    query = rule["query"]
+    if not _settings.get("pushdown", True) or rule.get("pushdown") is False:
+        return query, False
+    condition = rule.get("condition")
+    threshold = _threshold(rule.get("threshold"))
+    if condition not in COMPARISONS or threshold is None:
+        return query, False
+    if _SCALAR.match(query) or _is_range(query) or _has_comparison(query):
+        return query, False
+    return f"({query}) {condition} {threshold}", True
+
+
+# Pick the query for this evaluation. Push-down applies from the first
+# evaluation; every calibrate_every-th one of a rule/tenant runs unfiltered so
+# the saving can be measured. A one-shot (cron) run never calibrates, so it
+# reports transferred bytes without a saving estimate.
+def choose(rule, tenant=DEFAULT_TENANT):
+    query, pushed = plan(rule)
+    if not pushed:
+        return query, False
+    every = _settings.get("calibrate_every") or 0
+    with _lock:
+        entry = _stats.setdefault((rule["name"], str(tenant)), _new_entry())
+        entry["evaluations"] += 1
+        calibrate = every and entry["evaluations"] % every == 0
+    if calibrate:
+        return rule["query"], False
+    return query, True
+
+
+def _new_entry():
+    return {"evaluations": 0, "pushed": 0, "baseline_bytes": None, "bytes": 0, "bytes_saved": 0}
+
+
+# Record the response size of one evaluation. Baselines are per rule and
+# tenant, since tenants of the same rule can return very different results.
+def record(rule, pushed, nbytes, tenant=DEFAULT_TENANT):
+    with _lock:
+        entry = _stats.setdefault((rule["name"], str(tenant)), _new_entry())
+        if pushed:
+            entry["pushed"] += 1
+            entry["bytes"] += nbytes
+            if entry["baseline_bytes"] is not None:
+                entry["bytes_saved"] += max(0, entry["baseline_bytes"] - nbytes)
+        else:
+            entry["baseline_bytes"] = nbytes
+
+
+def stats():
+    with _lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
+
+
+def report():
+    entries = stats()
+    pushed = sum(e["pushed"] for e in entries.values())
+    if not pushed:
+        return
+    transferred = sum(e["bytes"] for e in entries.values())
+    if not any(e["baseline_bytes"] is not None for e in entries.values()):
+        logging.info(f"Threshold push-down: {pushed} evaluations, {transferred} bytes transferred (no baseline yet)")
+        return
+    saved = sum(e["bytes_saved"] for e in entries.values())
+    logging.info(f"Threshold push-down: {pushed} evaluations, {transferred} bytes transferred, ~{saved} bytes saved")
@@ -1,25 +1,143 @@
-import requests
 from urllib.parse import urlencode
+import json
 import logging
 
-def query_prometheus(rule, datasources):
-    query_params = {
+from libs.tenants import DEFAULT_TENANT, get_session, tenant_url
+from libs import cardinality
+from libs import planner
+from libs.series import SeriesSet
+from libs import tracing
+
+CHUNK_SIZE = 64 * 1024
+_RESULT_KEY = '"result"'
+
+
+# Yield the entries of data.result one at a time from a streamed response body,
+# so each series can be inspected (and discarded) before the next is decoded.
+# Bodies without a result array (errors) are decoded whole and checked.
+def iter_results(chunks):
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    chunks = iter(chunks)
+    exhausted = False
+
+    # Append the next chunk, dropping what has already been decoded
+    def more():
+        nonlocal buf, pos, exhausted
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    # Find the start of the result array
+    while True:
+        key = buf.find(_RESULT_KEY)
+        if key != -1:
+            bracket = buf.find("[", key + len(_RESULT_KEY))
+            if bracket != -1:
+                pos = bracket + 1
+                break
+        if not more():
+            body = json.loads(buf) if buf.strip() else {}
+            if body.get("status") == "error":
+                raise ValueError(f"{body.get('errorType')}: {body.get('error')}")
+            return
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            if not more():
+                raise ValueError("Truncated response")
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            series, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if exhausted or not more():
+                raise
+            continue
+        yield series
+        pos = end
+
+
+# Run a query against the rule's datasource and return the raw result entries,
+# bounded by the rule's cardinality limits (see libs/cardinality.py). Raises on
+# HTTP, decoding and cardinality errors. `params` overrides the query string,
+# e.g. {"query": ..., "time": ...}; `stats` (a dict) receives the body size.
+def fetch_results(rule, datasources, tenant=DEFAULT_TENANT, params=None, stats=None):
+    query_params = params or {
         "query": rule["query"]
     }
     datasource = datasources.get(rule["datasource"]["name"])
     if not datasource:
-        logging.error(f"Datasource {rule['datasource']['name']} not found.")
-        return None
-    
-    url = f'{datasource["url"]}?{urlencode(query_params)}'
+        raise ValueError(f"Datasource {rule['datasource']['name']} not found.")
+
+    base_url = tenant_url(datasource["url"], tenant)
+    url = f'{base_url}?{urlencode(query_params)}'
+    guard = cardinality.guard_for(rule)
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        results = data.get("data", {}).get("result", [])
-        if not results:
-            raise ValueError("No results")
-        return float(results[0]["value"][1])
+        with tracing.span("http_query", datasource=rule["datasource"]["name"]):
+            response = get_session(base_url).get(url, timeout=datasource.get("timeout", 30), stream=True)
+        # Closing the streamed response (also on HTTP errors) returns its
+        # connection to the per-host pool
+        with response:
+            response.raise_for_status()
+            # The body is read while it is decoded: each chunk read is its own
+            # http_body span inside json_decode, so decode time is json_decode
+            # minus its http_body children
+            with tracing.span("json_decode"):
+                response.encoding = response.encoding or "utf-8"
+                received = 0
+
+                def chunks():
+                    nonlocal received
+                    body = response.iter_content(CHUNK_SIZE, decode_unicode=True)
+                    while True:
+                        with tracing.span("http_body"):
+                            chunk = next(body, None)
+                        if chunk is None:
+                            return
+                        received += len(chunk)
+                        yield chunk
+
+                for series in iter_results(chunks()):
+                    guard.offer(series)
+        if stats is not None:
+            stats["bytes"] = received
+    except cardinality.CardinalityError:
+        cardinality.record(rule["name"], guard.seen, 0, aborted=True)
+        raise
+    return guard.result()
+
+
+# Query the datasource and return the rule's series as a SeriesSet. The
+# threshold is pushed into the query when that is safe (see libs/planner.py).
+def query_series(rule, datasources, tenant=DEFAULT_TENANT):
+    query, pushed = planner.choose(rule, tenant)
+    stats = {}
+    try:
+        results = fetch_results(rule, datasources, tenant, {"query": query}, stats)
+        planner.record(rule, pushed, stats.get("bytes", 0), tenant)
+        return SeriesSet.from_results(results)
+    except cardinality.CardinalityError as e:
+        logging.error(f"Cardinality limit for rule {rule['name']} (tenant {tenant}): {e}")
+        return None
     except Exception as e:
-        logging.error(f"Error querying datasource for rule {rule['name']}: {e}")
+        logging.error(f"Error querying datasource for rule {rule['name']} (tenant {tenant}): {e}")
+        return None
+
+
+def query_prometheus(rule, datasources, tenant=DEFAULT_TENANT):
+    results = query_series(rule, datasources, tenant)
+    if results is None:
+        return None
+    if not len(results):
+        logging.error(f"Error querying datasource for rule {rule['name']} (tenant {tenant}): No results")
         return None
+    return results.values[0]
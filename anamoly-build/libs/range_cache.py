@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+
+from libs.tenants import DEFAULT_TENANT, get_session, tenant_url
+
+# Step-aligned results cache for query_range.
+#
+# A range query is split into blocks of `block_steps` steps aligned to
+# multiples of the block length (from the epoch), so overlapping backfills and
+# what-if runs over the same expression map onto the same blocks. Blocks that
+# end before now - mutable_seconds can no longer change and are stored on local
+# disk (gzipped JSON, LRU-evicted by total size); only missing blocks and the
+# still-mutable recent ones are sent to the datasource.
+
+DEFAULT_BLOCK_STEPS = 240
+
+
+class RangeCache:
+    def __init__(self, directory="cache/query_range", max_bytes=512 * 1024 * 1024,
+                 block_steps=DEFAULT_BLOCK_STEPS, mutable_seconds=300):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.block_steps = int(block_steps)
+        self.mutable_seconds = mutable_seconds
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_fetched = 0
+        os.makedirs(directory, exist_ok=True)
+        self.sizes = {}
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".json.gz"):
+                self.sizes[path] = os.path.getsize(path)
+        self.total_bytes = sum(self.sizes.values())
+
+    def path_for(self, url, tenant, expr, step, block_start):
+        key = json.dumps([url, str(tenant), expr, step, block_start])
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ".json.gz")
+
+    # Any failure to read, decode or touch a block (evicted by another process,
+    # truncated, corrupt) is a miss; the entry is forgotten and re-fetched
+    def get(self, path):
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            entry = json.loads(gzip.decompress(raw))
+            result, size = entry["result"], entry["bytes"]
+            # Touch on read so eviction drops the least recently used blocks
+            os.utime(path)
+        except FileNotFoundError:
+            self._forget(path)
+            return None
+        except (OSError, EOFError, zlib.error, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Discarding unreadable range cache block {path}: {e}")
+            self._forget(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += size
+        return result
+
+    def _forget(self, path):
+        with self.lock:
+            self.total_bytes -= self.sizes.pop(path, 0)
+
+    # Store a block along with the size of the response it saves re-fetching
+    def put(self, path, results, size):
+        entry = {"bytes": size, "result": results}
+        raw = gzip.compress(json.dumps(entry, separators=(",", ":")).encode())
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, path)
+        with self.lock:
+            self.total_bytes += len(raw) - self.sizes.get(path, 0)
+            self.sizes[path] = len(raw)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        by_age = sorted(self.sizes, key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+        for path in by_age:
+            if self.total_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.total_bytes -= self.sizes.pop(path)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "bytes_fetched": self.bytes_fetched,
+                "cache_bytes": self.total_bytes,
+            }
+
+
+# /api/v1/query_range URL for a datasource configured with its /api/v1/query URL
+def range_url(datasource):
+    if datasource.get("range_url"):
+        return datasource["range_url"]
+    url = datasource["url"].rstrip("/")
+    return url + "_range" if url.endswith("/query") else url + "/api/v1/query_range"
+
+
+def _fetch(url, expr, start, end, step, timeout):
+    params = {"query": expr, "start": start, "end": end, "step": step}
+    response = get_session(url).get(f"{url}?{urlencode(params)}", timeout=timeout)
+    response.raise_for_status()
+    body = response.json()
+    if body.get("status") == "error":
+        raise ValueError(f"{body.get('errorType')}: {body.get('error')}")
+    return body.get("data", {}).get("result", []), len(response.content)
+
+
+# Merge per-block matrix results into one result list limited to [start, end]
+def _merge(blocks, start, end):
+    merged = {}
+    for results in blocks:
+        for entry in results:
+            key = json.dumps(entry.get("metric", {}), sort_keys=True)
+            target = merged.setdefault(key, {"metric": entry.get("metric", {}), "values": []})
+            target["values"].extend(v for v in entry.get("values", []) if start <= float(v[0]) <= end)
+    return list(merged.values())
+
+
+# Run a cached range query. start is aligned down to a multiple of step so the
+# evaluation timestamps are the same for every caller.
+def query_range(datasource, expr, start, end, step, tenant=DEFAULT_TENANT, cache=None, timeout=60):
+    url = tenant_url(range_url(datasource), tenant)
+    step = int(step)
+    start = int(start) // step * step
+    end = int(end)
+    if cache is None:
+        results, size = _fetch(url, expr, start, end, step, timeout)
+        return results
+
+    block = step * cache.block_steps
+    immutable_before = time.time() - cache.mutable_seconds
+    blocks = []
+    block_start = start // block * block
+    while block_start <= end:
+        # Each block covers the steps in [block_start, block_start + block)
+        block_end = block_start + block - step
+        path = cache.path_for(url, tenant, expr, step, block_start)
+        cacheable = block_end < immutable_before
+        results = cache.get(path) if cacheable else None
+        if results is None:
+            with cache.lock:
+                cache.misses += 1
+            # Mutable blocks are only fetched up to the requested end
+            fetch_end = block_end if cacheable else min(block_end, end)
+            results, size = _fetch(url, expr, block_start, fetch_end, step, timeout)
+            with cache.lock:
+                cache.bytes_fetched += size
+            if cacheable:
+                cache.put(path, results, size)
+        blocks.append(results)
+        block_start += block
+    return _merge(blocks, start, end)
+
+
+def from_config(settings):
+    settings = settings or {}
+    if not settings.get("enabled", True):
+        return None
+    cache = RangeCache(
+        directory=settings.get("directory", "cache/query_range"),
+        max_bytes=settings.get("max_bytes", 512 * 1024 * 1024),
+        block_steps=settings.get("block_steps", DEFAULT_BLOCK_STEPS),
+        mutable_seconds=settings.get("mutable_seconds", 300),
+    )
+    logging.info(f"Range query cache at {cache.directory} ({cache.total_bytes} bytes cached)")
+    return cache
@@ -0,0 +1,66 @@
+import importlib
+import logging
+import threading
+
+# Datasource and sink plugins, as "module:function" targets plus the arguments
+# each function takes. Nothing here is imported until a rule references it, so
+# e.g. mysql.connector is only loaded when some rule exports to MySQL.
+#
+# Sources return a SeriesSet (libs/series.py). Sinks get the rule's first
+# breaching value and, if they list it, the breaching `series`.
+SOURCES = {
+    "prometheus": ("libs.prometheus_query:query_series", ("rule", "datasources", "tenant")),
+    "incremental": ("libs.incremental:query_incremental", ("rule", "datasources", "tenant")),
+    "snmp": ("libs.snmp_source:query_snmp", ("rule", "datasources", "tenant")),
+}
+
+SINKS = {
+    "victoriametrics": ("libs.victoria_export:export_to_victoriametrics", ("rule", "value", "exports", "tenant", "series")),
+    "mysql": ("libs.mysql_exporter:export_to_mysql", ("rule", "value", "exports", "tenant")),
+    "file": ("libs.file_exporter:export_to_file", ("rule", "value")),
+    "history": ("libs.history:export_to_history", ("rule", "value", "exports", "tenant", "series")),
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def register_source(name, target, args=("rule", "datasources", "tenant")):
+    SOURCES[name] = (target, tuple(args))
+
+
+def register_sink(name, target, args=("rule", "value", "exports", "tenant")):
+    SINKS[name] = (target, tuple(args))
+
+
+def _import(target):
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+# Resolve a plugin to a callable taking keyword arguments. Names not in the
+# table may be given directly as "package.module:function" targets.
+def _load(kind, table, name, default_args):
+    key = (kind, name)
+    with _lock:
+        plugin = _loaded.get(key)
+        if plugin is None:
+            target, args = table.get(name, (name, default_args) if ":" in name else (None, None))
+            if target is None:
+                return None
+            fn = _import(target)
+            logging.debug(f"Loaded {kind} plugin {name} from {target}")
+
+            def plugin(fn=fn, args=args, **context):
+                return fn(*[context.get(arg) for arg in args])
+
+            _loaded[key] = plugin
+        return plugin
+
+
+def load_source(name):
+    return _load("source", SOURCES, name, ("rule", "datasources", "tenant"))
+
+
+def load_sink(name):
+    return _load("sink", SINKS, name, ("rule", "value", "exports", "tenant"))
@@ -0,0 +1,210 @@
+import logging
+import math
+import operator
+import threading
+from array import array
+
+# Columnar, interned representation of query results.
+#
+# Label names and values are interned once into a shared SymbolTable and each
+# series' labels become a tuple of integer ids (name, value, name, value, ...)
+# sorted by name id. Timestamps and values live in contiguous float arrays, so a
+# result set of N series costs one small tuple per series plus 16 bytes of
+# samples, instead of a dict of fresh strings and a [ts, "value"] list each.
+
+CONDITIONS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class SymbolTable:
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+        self.fragments = {}
+        self.lock = threading.Lock()
+
+    def intern(self, string):
+        sid = self.ids.get(string)
+        if sid is None:
+            with self.lock:
+                sid = self.ids.get(string)
+                if sid is None:
+                    sid = len(self.strings)
+                    self.strings.append(string)
+                    self.ids[string] = sid
+        return sid
+
+    # Id of an already interned string, or None (never grows the table)
+    def find(self, string):
+        return self.ids.get(string)
+
+    def lookup(self, sid):
+        return self.strings[sid]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+# Process-wide table: label names and common values are shared by every rule.
+# It only grows, so with label churn (pod ids, one-off series) rotate_symbols()
+# swaps in a fresh table between passes once it passes max_symbols. SeriesSets
+# keep a reference to the table they were built with, so sets still queued for
+# export stay valid; the old table is freed with the last of them.
+_symbols = SymbolTable()
+MAX_SYMBOLS = 1000000
+MAX_FRAGMENTS = 200000
+
+
+def symbols():
+    return _symbols
+
+
+def rotate_symbols(max_symbols=None):
+    global _symbols
+    limit = MAX_SYMBOLS if max_symbols is None else max_symbols
+    if len(_symbols) > limit:
+        logging.info(f"Symbol table reached {len(_symbols)} strings, starting a new one")
+        _symbols = SymbolTable()
+        return True
+    return False
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value):
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+# Rendered `name="value"` text for a label pair, cached per table by id pair so
+# each distinct label is escaped and formatted once. The cache is cleared when
+# it reaches MAX_FRAGMENTS.
+def _fragment(table, name_id, value_id):
+    key = (name_id, value_id)
+    text = table.fragments.get(key)
+    if text is None:
+        text = f'{table.lookup(name_id)}="{_escape(table.lookup(value_id))}"'
+        if len(table.fragments) >= MAX_FRAGMENTS:
+            table.fragments.clear()
+        table.fragments[key] = text
+    return text
+
+
+class SeriesSet:
+    def __init__(self, symbols=None):
+        self.symbols = symbols if symbols is not None else _symbols
+        self.labels = []
+        self.timestamps = array("d")
+        self.values = array("d")
+
+    def __len__(self):
+        return len(self.labels)
+
+    def intern_labels(self, metric):
+        intern = self.symbols.intern
+        pairs = sorted((intern(k), intern(v)) for k, v in metric.items())
+        return tuple(sid for pair in pairs for sid in pair)
+
+    def append(self, metric, timestamp, value):
+        self.labels.append(self.intern_labels(metric))
+        self.timestamps.append(float(timestamp))
+        self.values.append(float(value))
+
+    def append_ids(self, label_ids, timestamp, value):
+        self.labels.append(label_ids)
+        self.timestamps.append(timestamp)
+        self.values.append(value)
+
+    # Build from Prometheus API result entries (vector, or matrix using the
+    # last sample of each series)
+    @classmethod
+    def from_results(cls, results, symbols=None):
+        series = cls(symbols)
+        for entry in results:
+            sample = entry.get("value") or (entry.get("values") or [None])[-1]
+            if sample is None:
+                continue
+            series.append(entry.get("metric", {}), sample[0], sample[1])
+        return series
+
+    def label(self, index, name):
+        name_id = self.symbols.find(name)
+        if name_id is None:
+            return None
+        ids = self.labels[index]
+        for i in range(0, len(ids), 2):
+            if ids[i] == name_id:
+                return self.symbols.lookup(ids[i + 1])
+        return None
+
+    def label_dict(self, index):
+        ids = self.labels[index]
+        lookup = self.symbols.lookup
+        return {lookup(ids[i]): lookup(ids[i + 1]) for i in range(0, len(ids), 2)}
+
+    # Indices of series whose labels equal every name/value in matchers.
+    # Matching compares integer ids; a string never interned matches nothing.
+    def match(self, matchers):
+        wanted = []
+        for name, value in matchers.items():
+            name_id, value_id = self.symbols.find(name), self.symbols.find(value)
+            if name_id is None or value_id is None:
+                return []
+            wanted.append((name_id, value_id))
+        matched = []
+        for index, ids in enumerate(self.labels):
+            pairs = dict(zip(ids[::2], ids[1::2]))
+            if all(pairs.get(n) == v for n, v in wanted):
+                matched.append(index)
+        return matched
+
+    # Indices of series whose value satisfies `value <condition> threshold`
+    def compare(self, condition, threshold):
+        op = CONDITIONS.get(condition)
+        if op is None:
+            raise ValueError(f"Unknown condition {condition}")
+        threshold = float(threshold)
+        return [i for i, v in enumerate(self.values) if not math.isnan(v) and op(v, threshold)]
+
+    def select(self, indices):
+        subset = SeriesSet(self.symbols)
+        for i in indices:
+            subset.append_ids(self.labels[i], self.timestamps[i], self.values[i])
+        return subset
+
+    # Prometheus text exposition lines, one per series. extra_labels are added
+    # (and override same-named series labels); the series' own __name__ is
+    # replaced by metric_name. timestamp_ms defaults to each sample's time.
+    def to_prometheus_lines(self, metric_name, extra_labels=None, timestamp_ms=None):
+        # Extra labels are rendered directly rather than interned, so exports
+        # never grow the table; only names already in it can shadow a label
+        extra = ",".join(f'{k}="{_escape(str(v))}"' for k, v in (extra_labels or {}).items())
+        skip = {self.symbols.find(str(k)) for k in (extra_labels or {})}
+        skip.add(self.symbols.find("__name__"))
+        skip.discard(None)
+        lines = []
+        for index, ids in enumerate(self.labels):
+            fragments = [_fragment(self.symbols, ids[i], ids[i + 1]) for i in range(0, len(ids), 2) if ids[i] not in skip]
+            if extra:
+                fragments.append(extra)
+            label_str = ",".join(fragments)
+            ts = timestamp_ms if timestamp_ms is not None else int(self.timestamps[index] * 1000)
+            lines.append(f"{metric_name}{{{label_str}}} {format_value(self.values[index])} {ts}")
+        return lines
+
+    def to_results(self):
+        return [
+            {"metric": self.label_dict(i), "value": [self.timestamps[i], format_value(self.values[i])]}
+            for i in range(len(self))
+        ]
@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+import logging
+
+from libs.registry import load_sink
+from libs.tenants import DEFAULT_TENANT
+from libs import tracing
+
+_STOP = object()
+
+
+# Sinks a rule exports to: `export.datastores` (list) or the single `export.datastore`
+def rule_sinks(rule):
+    export = rule.get("export", {})
+    if export.get("datastores"):
+        return list(export["datastores"])
+    if export.get("datastore"):
+        return [export["datastore"]]
+    return []
+
+
+# One sink behind its own bounded queue and worker thread. With policy "drop"
+# a full queue discards the new item; with "block" the producer waits (up to
+# block_timeout seconds, then drops) so a slow sink only slows down itself.
+class SinkWorker:
+    def __init__(self, name, export_fn, exports, queue_size=1000, policy="drop", block_timeout=None):
+        self.name = name
+        self.export_fn = export_fn
+        self.exports = exports
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name=f"sink-{name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, rule, value, tenant=DEFAULT_TENANT, series=None):
+        item = (time.monotonic(), rule, value, tenant, series, tracing.current())
+        try:
+            if self.policy == "block":
+                self.queue.put(item, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(item)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            logging.warning(f"Sink {self.name} queue full, dropped export for {rule['name']}")
+            return False
+        with self.lock:
+            self.enqueued += 1
+        return True
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self.queue.task_done()
+                return
+            queued_at, rule, value, tenant, series, trace_context = item
+            lag = time.monotonic() - queued_at
+            try:
+                with tracing.span(f"export:{self.name}", context=trace_context, queue_lag=round(lag, 6)):
+                    self.export_fn(rule=rule, value=value, exports=self.exports, tenant=tenant, series=series)
+                with self.lock:
+                    self.processed += 1
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                logging.error(f"Sink {self.name} export error for {rule['name']}: {e}")
+            with self.lock:
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+            self.queue.task_done()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "processed": self.processed,
+                "errors": self.errors,
+                "last_lag_seconds": round(self.last_lag, 3),
+                "max_lag_seconds": round(self.max_lag, 3),
+            }
+
+    # Let the worker drain what is already queued, then stop it. With a timeout,
+    # a queue that stays full is abandoned (the thread is a daemon).
+    def close(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logging.warning(f"Sink {self.name} still has {self.queue.qsize()} queued exports at shutdown, abandoning them")
+            return
+        self.thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+
+# Fan triggered rules out to every sink they list. Workers (and the sink plugin
+# itself) are created on first use so unused sinks cost nothing; per-sink queue
+# settings come from exports.<sink>.queue_size / policy / block_timeout.
+class SinkPipeline:
+    def __init__(self, exports):
+        self.exports = exports
+        self.workers = {}
+        self.lock = threading.Lock()
+
+    def _worker(self, name):
+        with self.lock:
+            worker = self.workers.get(name)
+            if worker is None:
+                try:
+                    export_fn = load_sink(name)
+                except ImportError as e:
+                    logging.error(f"Sink {name} could not be loaded: {e}")
+                    return None
+                if export_fn is None:
+                    return None
+                settings = self.exports.get(name, {}) or {}
+                worker = SinkWorker(
+                    name,
+                    export_fn,
+                    self.exports,
+                    queue_size=settings.get("queue_size", 1000),
+                    policy=settings.get("policy", "drop"),
+                    block_timeout=settings.get("block_timeout"),
+                )
+                self.workers[name] = worker
+            return worker
+
+    def dispatch(self, rule, value, tenant=DEFAULT_TENANT, series=None):
+        for name in rule_sinks(rule):
+            worker = self._worker(name)
+            if worker is None:
+                logging.warning(f"Unknown sink {name} in rule {rule['name']}")
+                continue
+            worker.submit(rule, value, tenant, series)
+
+    def stats(self):
+        with self.lock:
+            return {name: worker.stats() for name, worker in self.workers.items()}
+
+    # Log queue depth, drops and lag per sink; main calls this after every pass
+    def report(self):
+        for name, stats in self.stats().items():
+            logging.info(f"Sink {name}: {stats}")
+
+    # timeout bounds the whole drain, shared across sinks
+    def close(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            workers = list(self.workers.values())
+        for worker in workers:
+            worker.close(None if deadline is None else max(0, deadline - time.monotonic()))
+        self.report()
@@ -0,0 +1,467 @@
+import asyncio
+import itertools
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+import yaml
+
+from libs.series import SeriesSet
+from libs.tenants import DEFAULT_TENANT
+
+# Native SNMP datasource: polls devices directly with SNMPv2c GETBULK walks of
+# the OID modules in snmp_exporter/bgp_oid.txt and decodes the varbinds into the
+# same SeriesSet the Prometheus source returns, so rules can evaluate BGP and
+# device health metrics without going through snmp_exporter and vmselect.
+#
+#   datasources:
+#     cisco-snmp:
+#       type: snmp
+#       module_file: "../snmp_exporter/bgp_oid.txt"
+#       module: "cisco_device"
+#       community: "public"
+#       devices: ["10.0.0.1", "10.0.0.2:1161"]   # or devices_file: one per line
+#       timeout: 2
+#       retries: 2
+#       max_repetitions: 25
+#       max_inflight: 2000        # requests in flight across all devices
+#       per_device:
+#         max_inflight: 2         # concurrent walks per device
+#         rate: 20                # requests per second per device
+#       cache_seconds: 10         # rules in the same pass share one poll
+#
+# A rule's `query` is a metric name from the module, optionally with equality
+# matchers: bgpPeerState{bgpPeerRemoteAddr="192.0.2.1"}. Everything is plain
+# asyncio over one UDP socket, so it can be pointed at a local simulator such
+# as snmpsim (snmpsim-command-responder --agent-udpv4-endpoint=127.0.0.1:1161).
+
+# --- BER encoding -----------------------------------------------------------
+
+INTEGER, OCTET_STRING, NULL, OBJECT_ID, SEQUENCE = 0x02, 0x04, 0x05, 0x06, 0x30
+IP_ADDRESS, COUNTER32, GAUGE32, TIMETICKS, OPAQUE, COUNTER64 = 0x40, 0x41, 0x42, 0x43, 0x44, 0x46
+NO_SUCH_OBJECT, NO_SUCH_INSTANCE, END_OF_MIB_VIEW = 0x80, 0x81, 0x82
+GET_REQUEST, GET_RESPONSE, GET_BULK_REQUEST = 0xA0, 0xA2, 0xA5
+SNMP_V2C = 1
+
+NUMERIC_TYPES = (INTEGER, COUNTER32, GAUGE32, TIMETICKS, COUNTER64)
+EXCEPTIONS = (NO_SUCH_OBJECT, NO_SUCH_INSTANCE, END_OF_MIB_VIEW)
+
+
+def encode_length(length):
+    if length < 0x80:
+        return bytes([length])
+    raw = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(raw)]) + raw
+
+
+def encode_tlv(tag, content):
+    return bytes([tag]) + encode_length(len(content)) + content
+
+
+def encode_int(value, tag=INTEGER):
+    length = max(1, (value.bit_length() + 8) // 8)
+    return encode_tlv(tag, value.to_bytes(length, "big", signed=True))
+
+
+def encode_oid(oid):
+    first, second, *rest = oid
+    content = bytearray([first * 40 + second])
+    for sub in rest:
+        chunk = [sub & 0x7F]
+        sub >>= 7
+        while sub:
+            chunk.append(0x80 | (sub & 0x7F))
+            sub >>= 7
+        content.extend(reversed(chunk))
+    return encode_tlv(OBJECT_ID, bytes(content))
+
+
+def encode_request(pdu_type, request_id, community, oids, non_repeaters=0, max_repetitions=0):
+    varbinds = b"".join(encode_tlv(SEQUENCE, encode_oid(oid) + encode_tlv(NULL, b"")) for oid in oids)
+    pdu = encode_tlv(pdu_type, (
+        encode_int(request_id)
+        + encode_int(non_repeaters)
+        + encode_int(max_repetitions)
+        + encode_tlv(SEQUENCE, varbinds)
+    ))
+    return encode_tlv(SEQUENCE, encode_int(SNMP_V2C) + encode_tlv(OCTET_STRING, community.encode()) + pdu)
+
+
+# --- BER decoding -----------------------------------------------------------
+
+def decode_tlv(data, pos):
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[pos:pos + size], "big")
+        pos += size
+    return tag, data[pos:pos + length], pos + length
+
+
+def decode_oid(content):
+    first = content[0]
+    oid = [first // 40, first % 40]
+    value = 0
+    for byte in content[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            oid.append(value)
+            value = 0
+    return tuple(oid)
+
+
+def decode_value(tag, content):
+    if tag == INTEGER:
+        return int.from_bytes(content, "big", signed=True)
+    if tag in (COUNTER32, GAUGE32, TIMETICKS, COUNTER64):
+        return int.from_bytes(content, "big", signed=False)
+    if tag == OBJECT_ID:
+        return decode_oid(content)
+    if tag == IP_ADDRESS:
+        return ".".join(str(b) for b in content)
+    return bytes(content)
+
+
+# Parse a GetResponse into (request_id, error_status, [(oid, tag, value)])
+def decode_response(data):
+    _, message, _ = decode_tlv(data, 0)
+    _, _, pos = decode_tlv(message, 0)            # version
+    _, _, pos = decode_tlv(message, pos)          # community
+    pdu_type, pdu, _ = decode_tlv(message, pos)
+    if pdu_type != GET_RESPONSE:
+        raise ValueError(f"Unexpected PDU type {pdu_type:#x}")
+    _, request_id, pos = decode_tlv(pdu, 0)
+    _, error_status, pos = decode_tlv(pdu, pos)
+    _, _, pos = decode_tlv(pdu, pos)              # error index
+    _, varbind_list, _ = decode_tlv(pdu, pos)
+    varbinds = []
+    pos = 0
+    while pos < len(varbind_list):
+        _, varbind, pos = decode_tlv(varbind_list, pos)
+        _, oid, inner = decode_tlv(varbind, 0)
+        tag, content, _ = decode_tlv(varbind, inner)
+        varbinds.append((decode_oid(oid), tag, decode_value(tag, content)))
+    return (
+        int.from_bytes(request_id, "big", signed=True),
+        int.from_bytes(error_status, "big", signed=True),
+        varbinds,
+    )
+
+
+def parse_oid(text):
+    return tuple(int(part) for part in str(text).strip(".").split("."))
+
+
+# --- Transport --------------------------------------------------------------
+
+class SNMPProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.pending = {}
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            request_id, error_status, varbinds = decode_response(data)
+        except Exception as e:
+            logging.debug(f"Dropping undecodable SNMP packet from {addr}: {e}")
+            return
+        future = self.pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result((error_status, varbinds))
+
+    def error_received(self, exc):
+        logging.debug(f"SNMP socket error: {exc}")
+
+
+# Requests per device are limited by a semaphore (in-flight) and a minimum
+# spacing between sends (rate)
+class DeviceLimiter:
+    def __init__(self, max_inflight=2, rate=0):
+        self.semaphore = asyncio.Semaphore(max(1, int(max_inflight)))
+        self.interval = 1.0 / rate if rate else 0
+        self.next_send = 0.0
+        self.lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            async with self.lock:
+                now = time.monotonic()
+                wait = self.next_send - now
+                self.next_send = max(now, self.next_send) + self.interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+class SNMPClient:
+    def __init__(self, community="public", timeout=2.0, retries=2, max_inflight=2000, per_device=None):
+        self.community = community
+        self.timeout = float(timeout)
+        self.retries = int(retries)
+        self.inflight = asyncio.Semaphore(int(max_inflight))
+        self.per_device = per_device or {}
+        self.limiters = {}
+        self.unreachable = set()
+        self.request_ids = itertools.count(random.randrange(1, 1 << 30))
+        self.protocol = None
+        self.transport = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.transport, self.protocol = await loop.create_datagram_endpoint(
+            SNMPProtocol, local_addr=("0.0.0.0", 0)
+        )
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def limiter(self, device):
+        limiter = self.limiters.get(device)
+        if limiter is None:
+            limiter = self.limiters[device] = DeviceLimiter(
+                self.per_device.get("max_inflight", 2), self.per_device.get("rate", 0)
+            )
+        return limiter
+
+    async def request(self, device, pdu_type, oids, max_repetitions=0):
+        loop = asyncio.get_running_loop()
+        async with self.limiter(device), self.inflight:
+            # Once a device has timed out, its remaining walks fail fast
+            if device in self.unreachable:
+                raise TimeoutError(f"No SNMP response from {device[0]}:{device[1]}")
+            for attempt in range(self.retries + 1):
+                request_id = next(self.request_ids) & 0x7FFFFFFF
+                future = loop.create_future()
+                self.protocol.pending[request_id] = future
+                packet = encode_request(pdu_type, request_id, self.community, oids, 0, max_repetitions)
+                self.transport.sendto(packet, device)
+                try:
+                    error_status, varbinds = await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    self.protocol.pending.pop(request_id, None)
+                    continue
+                if error_status:
+                    raise ValueError(f"SNMP error status {error_status} from {device[0]}:{device[1]}")
+                return varbinds
+            self.unreachable.add(device)
+        raise TimeoutError(f"No SNMP response from {device[0]}:{device[1]}")
+
+    async def get(self, device, oids):
+        varbinds = await self.request(device, GET_REQUEST, oids)
+        return [(oid, tag, value) for oid, tag, value in varbinds if tag not in EXCEPTIONS]
+
+    # GETBULK walk of one subtree
+    async def walk(self, device, root, max_repetitions=25):
+        results = []
+        cursor = root
+        while True:
+            varbinds = await self.request(device, GET_BULK_REQUEST, [cursor], max_repetitions)
+            if not varbinds:
+                return results
+            for oid, tag, value in varbinds:
+                if tag == END_OF_MIB_VIEW or oid[:len(root)] != root or oid <= cursor:
+                    return results
+                results.append((oid, tag, value))
+                cursor = oid
+
+
+# --- Module decoding --------------------------------------------------------
+
+def load_modules(path):
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+# Consume one index from the OID suffix according to its type
+def _take_index(suffix, index_type):
+    if index_type in ("InetAddressIPv4", "IpAddr"):
+        if len(suffix) < 4:
+            raise IndexError("short IPv4 index")
+        return ".".join(str(part) for part in suffix[:4]), suffix[4:]
+    return str(suffix[0]), suffix[1:]
+
+
+def _format_string(value):
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            text = value.decode("utf-8")
+            if text.isprintable():
+                return text
+        except UnicodeDecodeError:
+            pass
+        return "0x" + value.hex().upper()
+    if isinstance(value, tuple):
+        return ".".join(str(part) for part in value)
+    return str(value)
+
+
+# Index a module's metrics by OID for prefix lookups while decoding
+def compile_metrics(module):
+    by_oid = {parse_oid(m["oid"]): m for m in module.get("metrics", [])}
+    return by_oid, sorted({len(oid) for oid in by_oid}, reverse=True)
+
+
+# Turn one device's varbinds into series, following the module's metric list
+def decode_metrics(metrics, device_name, varbinds, timestamp, series=None):
+    series = series if series is not None else SeriesSet()
+    by_oid, lengths = metrics
+    for oid, tag, value in varbinds:
+        metric = None
+        for length in lengths:
+            metric = by_oid.get(oid[:length])
+            if metric is not None:
+                break
+        if metric is None:
+            continue
+        suffix = oid[length:]
+        labels = {"__name__": metric["name"], "instance": device_name}
+        try:
+            for index in metric.get("indexes", []):
+                labels[index["labelname"]], suffix = _take_index(suffix, index.get("type"))
+        except IndexError:
+            continue
+        if tag in NUMERIC_TYPES:
+            sample = float(value)
+        else:
+            # Strings and addresses become info-style series with value 1
+            labels[metric["name"]] = _format_string(value)
+            sample = 1.0
+        series.append(labels, timestamp, sample)
+    return series
+
+
+def _device_address(device, default_port):
+    host, _, port = str(device).partition(":")
+    return host, int(port or default_port)
+
+
+async def poll_devices(settings, module, devices):
+    client = SNMPClient(
+        community=settings.get("community", "public"),
+        timeout=settings.get("timeout", 2),
+        retries=settings.get("retries", 2),
+        max_inflight=settings.get("max_inflight", 2000),
+        per_device=settings.get("per_device"),
+    )
+    await client.open()
+    max_repetitions = int(settings.get("max_repetitions", 25))
+    walk_roots = [parse_oid(oid) for oid in module.get("walk", [])]
+    get_oids = [parse_oid(oid) for oid in module.get("get", [])]
+    metrics = compile_metrics(module)
+    series = SeriesSet()
+    failed = 0
+
+    async def poll(device):
+        nonlocal failed
+        address = _device_address(device, settings.get("port", 161))
+        tasks = [client.walk(address, root, max_repetitions) for root in walk_roots]
+        if get_oids:
+            tasks.append(client.get(address, get_oids))
+        varbinds = []
+        errors = []
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                errors.append(result)
+            else:
+                varbinds.extend(result)
+        if errors:
+            failed += 1
+            logging.warning(f"SNMP poll of {device}: {len(errors)}/{len(tasks)} requests failed ({errors[0]})")
+        decode_metrics(metrics, str(device), varbinds, time.time(), series)
+
+    try:
+        await asyncio.gather(*(poll(device) for device in devices))
+    finally:
+        client.close()
+    logging.info(f"SNMP poll: {len(devices)} devices ({failed} with errors), {len(series)} series")
+    return series
+
+
+def _devices(settings):
+    devices = list(settings.get("devices", []))
+    if settings.get("devices_file"):
+        with open(settings["devices_file"]) as f:
+            devices.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return devices
+
+
+_cache = {}
+_cache_locks = {}
+_cache_lock = threading.Lock()
+_MATCHER = re.compile(r'\s*(\w+)\s*(=~|!~|!=|=)\s*"((?:[^"\\]|\\.)*)"\s*(,|$)')
+
+
+# Poll every device of a datasource, sharing the result between rules for
+# cache_seconds. Each caller thread runs its own event loop for the poll.
+def poll_datasource(name, settings):
+    with _cache_lock:
+        lock = _cache_locks.setdefault(name, threading.Lock())
+    with lock:
+        cached = _cache.get(name)
+        if cached and time.monotonic() - cached[0] < settings.get("cache_seconds", 10):
+            return cached[1]
+        module_file = settings.get("module_file", "../snmp_exporter/bgp_oid.txt")
+        if not os.path.isabs(module_file):
+            module_file = os.path.join(os.getcwd(), module_file)
+        modules = load_modules(module_file)
+        module = modules[settings.get("module", next(iter(modules)))]
+        series = asyncio.run(poll_devices(settings, module, _devices(settings)))
+        _cache[name] = (time.monotonic(), series)
+        return series
+
+
+# `metric` or `metric{label="value",...}` -> {label: value} including
+# __name__. Only equality matchers are supported; anything else is rejected
+# rather than silently widening the selection.
+def parse_selector(query):
+    query = query.strip()
+    metric, brace, matchers = query.partition("{")
+    wanted = {"__name__": metric.strip()}
+    if not brace:
+        return wanted
+    if not matchers.rstrip().endswith("}"):
+        raise ValueError(f"Unterminated label matchers in {query!r}")
+    matchers = matchers.rstrip()[:-1]
+    pos = 0
+    while matchers[pos:].strip():
+        match = _MATCHER.match(matchers, pos)
+        if match is None:
+            raise ValueError(f"Invalid label matcher in {query!r} at {matchers[pos:]!r}")
+        label, op, value, _ = match.groups()
+        if op != "=":
+            raise ValueError(f"Unsupported matcher {label}{op}\"{value}\" in {query!r}: SNMP rules only support =")
+        wanted[label] = re.sub(r"\\(.)", r"\1", value)
+        pos = match.end()
+    return wanted
+
+
+# Source plugin: rule query is `metric` or `metric{label="value",...}`
+def query_snmp(rule, datasources, tenant=DEFAULT_TENANT):
+    name = rule["datasource"]["name"]
+    settings = datasources.get(name)
+    if not settings:
+        logging.error(f"Datasource {name} not found.")
+        return None
+    try:
+        wanted = parse_selector(rule["query"])
+    except ValueError as e:
+        logging.error(f"Invalid SNMP query for rule {rule['name']}: {e}")
+        return None
+    try:
+        series = poll_datasource(name, settings)
+    except Exception as e:
+        logging.error(f"Error polling SNMP datasource {name} for rule {rule['name']}: {e}")
+        return None
+    return series.select(series.match(wanted))
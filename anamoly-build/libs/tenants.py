@@ -0,0 +1,153 @@
+import re
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+DEFAULT_TENANT = "0"
+
+# VictoriaMetrics cluster URLs carry the tenant as the path segment after
+# /select/ or /insert/, e.g. /select/0/prometheus/api/v1/query
+_TENANT_PATH = re.compile(r"/(select|insert)/[^/]+/")
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+# Resolve the tenant in a datasource or export URL. URLs may use an explicit
+# {tenant} placeholder; hardcoded cluster URLs get their tenant segment swapped.
+def tenant_url(url, tenant):
+    tenant = str(tenant)
+    if "{tenant}" in url:
+        return url.replace("{tenant}", tenant)
+    return _TENANT_PATH.sub(lambda m: f"/{m.group(1)}/{tenant}/", url, count=1)
+
+
+# Return the shared HTTP session for the host of a URL. Sessions are keyed by
+# scheme://host:port only, so every tenant on a vmselect/vminsert host reuses
+# the same keep-alive connection pool. requests is imported here so runs that
+# never touch HTTP do not pay for it.
+def get_session(url, pool_size=32):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount(key, adapter)
+            _sessions[key] = session
+        return session
+
+
+# Per-tenant quota: a cap on in-flight evaluations plus a token bucket limiting
+# how many evaluations may start per second.
+class TenantQuota:
+    def __init__(self, max_concurrency=4, rate=0, burst=None):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate = float(rate or 0)
+        self.burst = float(burst or max(1.0, self.rate))
+        self.in_flight = 0
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Claim a slot without blocking. Returns 0 on success, otherwise the number
+    # of seconds until a token is expected (or None when only concurrency is full).
+    def try_acquire(self):
+        with self.lock:
+            if self.in_flight >= self.max_concurrency:
+                return None
+            if self.rate > 0:
+                self._refill(time.monotonic())
+                if self.tokens < 1:
+                    return (1 - self.tokens) / self.rate
+                self.tokens -= 1
+            self.in_flight += 1
+            return 0
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+# Build the quota table from the `quotas` config section. The `default` entry
+# applies to any tenant without its own block.
+class TenantQuotas:
+    def __init__(self, config=None):
+        config = config or {}
+        self.defaults = config.get("default", {})
+        self.overrides = {str(k): v for k, v in config.items() if k != "default"}
+        self.quotas = {}
+        self.lock = threading.Lock()
+
+    def get(self, tenant):
+        tenant = str(tenant)
+        with self.lock:
+            quota = self.quotas.get(tenant)
+            if quota is None:
+                settings = dict(self.defaults)
+                settings.update(self.overrides.get(tenant, {}))
+                quota = TenantQuota(
+                    max_concurrency=settings.get("max_concurrency", 4),
+                    rate=settings.get("rate", 0),
+                    burst=settings.get("burst"),
+                )
+                self.quotas[tenant] = quota
+            return quota
+
+
+# Run (tenant, fn) jobs on a shared worker pool, dispatching round-robin across
+# tenants. A job is only handed to the pool once its tenant has a free slot and
+# a rate token, so a tenant over quota waits in its own queue instead of holding
+# worker threads that other tenants need.
+def run_fair(jobs, quotas, workers=8):
+    queues = {}
+    for tenant, fn in jobs:
+        queues.setdefault(str(tenant), deque()).append(fn)
+
+    results = []
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while queues or running:
+            next_wake = None
+            dispatched = True
+            while dispatched and len(running) < workers:
+                dispatched = False
+                for tenant in list(queues):
+                    if len(running) >= workers:
+                        break
+                    wait_for = quotas.get(tenant).try_acquire()
+                    if wait_for != 0:
+                        if wait_for is not None:
+                            next_wake = wait_for if next_wake is None else min(next_wake, wait_for)
+                        continue
+                    fn = queues[tenant].popleft()
+                    if not queues[tenant]:
+                        del queues[tenant]
+                    running[pool.submit(fn)] = tenant
+                    dispatched = True
+
+            if not running:
+                time.sleep(next_wake or 0.01)
+                continue
+
+            done, _ = wait(running, timeout=next_wake, return_when=FIRST_COMPLETED)
+            for future in done:
+                tenant = running.pop(future)
+                quotas.get(tenant).release()
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logging.error(f"Evaluation failed for tenant {tenant}: {e}")
+    return results
@@ -0,0 +1,199 @@
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import signal
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Spans are written in the Chrome trace event format ("X" complete events in a
+# JSON array), which chrome://tracing, Perfetto and speedscope open directly.
+# The array is left unterminated so the file can be appended to across runs;
+# all of those viewers accept that.
+
+_local = threading.local()
+_tracer = None
+_profiler = None
+
+
+class Tracer:
+    def __init__(self, path, sample_rate=1.0):
+        self.path = path
+        self.sample_rate = float(sample_rate)
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a")
+        if self.file.tell() == 0:
+            self.file.write("[\n")
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def write(self, name, start, duration, args):
+        event = {
+            "name": name,
+            "cat": "rule",
+            "ph": "X",
+            "ts": int(start * 1e6),
+            "dur": int(duration * 1e6),
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        line = json.dumps(event) + ",\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+# Enable tracing from the `tracing` config section: {path, sample_rate}
+def configure(settings):
+    global _tracer
+    settings = settings or {}
+    if not settings.get("path"):
+        return
+    _tracer = Tracer(settings["path"], settings.get("sample_rate", 1.0))
+    logging.info(f"Tracing rule evaluations to {_tracer.path} (sample rate {_tracer.sample_rate})")
+
+
+# Close the trace file and write out any partially collected profile (e.g. a
+# cron run with fewer evaluations than profiling.evaluations)
+def shutdown():
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
+    if _profiler is not None:
+        _profiler.flush()
+
+
+# Trace context of the current thread: a dict of args shared by every span of
+# one sampled rule evaluation, or None when the evaluation is not traced.
+def current():
+    return getattr(_local, "context", None)
+
+
+# Root span for one rule evaluation; decides sampling for all of its children
+@contextmanager
+def trace(name, **args):
+    if _tracer is None or not _tracer.sampled():
+        _local.context = None
+        yield
+        return
+    context = dict(args, trace_id=uuid.uuid4().hex[:16])
+    _local.context = context
+    try:
+        with span(name):
+            yield
+    finally:
+        _local.context = None
+
+
+# Child span. Pass `context` to continue a trace on another thread (e.g. a sink
+# worker); by default the current thread's context is used.
+@contextmanager
+def span(name, context=None, **args):
+    if context is None:
+        context = current()
+    tracer = _tracer
+    if tracer is None or context is None:
+        yield
+        return
+    start = time.time()
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.write(name, start, time.perf_counter() - began, dict(context, **args))
+
+
+# On-demand cProfile: after SIGUSR1 (or arm()), the next N evaluations run under
+# the profiler and their combined stats are dumped to a .pstats file (or at
+# shutdown, if fewer evaluations ran). Only one
+# evaluation is profiled at a time because cProfile cannot be enabled on
+# several threads at once on newer interpreters; the others run unprofiled.
+class Profiler:
+    def __init__(self, evaluations=50, directory="profiles"):
+        self.evaluations = int(evaluations)
+        self.directory = directory
+        self.remaining = 0
+        self.stats = None
+        self.lock = threading.Lock()
+        self.running = threading.Lock()
+
+    def arm(self, evaluations=None):
+        with self.lock:
+            self.remaining = int(evaluations or self.evaluations)
+            self.stats = None
+        logging.info(f"Profiling the next {self.remaining} evaluations")
+
+    def run(self, fn, *args, **kwargs):
+        if self.remaining <= 0 or not self.running.acquire(blocking=False):
+            return fn(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn, *args, **kwargs)
+        finally:
+            self.running.release()
+            self._collect(profile)
+
+    def _collect(self, profile):
+        with self.lock:
+            if self.remaining <= 0:
+                return
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+            self.remaining -= 1
+            if self.remaining == 0:
+                self._dump()
+
+    # Dump whatever has been collected and disarm
+    def flush(self):
+        with self.lock:
+            self.remaining = 0
+            if self.stats is not None:
+                self._dump()
+
+    def _dump(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"profile-{int(time.time())}-{os.getpid()}.pstats")
+        self.stats.dump_stats(path)
+        self.stats = None
+        logging.info(f"Profile written to {path} (view with: python -m pstats {path})")
+
+
+# Set up the profiler from the `profiling` config section: {evaluations,
+# directory, signal}. The signal (SIGUSR1 by default) arms it at runtime.
+def configure_profiling(settings):
+    global _profiler
+    settings = settings or {}
+    _profiler = Profiler(settings.get("evaluations", 50), settings.get("directory", "profiles"))
+    signame = settings.get("signal", "SIGUSR1")
+    signum = getattr(signal, signame, None)
+    if signum is None:
+        logging.warning(f"Signal {signame} not available; profiling can only be armed from code")
+    elif threading.current_thread() is threading.main_thread():
+        signal.signal(signum, lambda *_: _profiler.arm())
+    if settings.get("start"):
+        _profiler.arm()
+    return _profiler
+
+
+# Run one evaluation, under the profiler when it is armed
+def profiled(fn, *args, **kwargs):
+    if _profiler is None:
+        return fn(*args, **kwargs)
+    return _profiler.run(fn, *args, **kwargs)
@@ -1,30 +1,34 @@
+import logging
+import time
+
 import requests
-from datetime import datetime
-import json
 
-def export_to_victoriametrics(rule, value, exports):
+from libs.tenants import DEFAULT_TENANT, get_session, tenant_url
+
+def export_to_victoriametrics(rule, value, exports, tenant=DEFAULT_TENANT, series=None):
     vm_config = exports["victoriametrics"]
+    url = tenant_url(vm_config["url"], tenant)
     
-    try:
-        # Add dummy labels if none are defined
-        labels = rule.get("labels", {"source": "custom_export"})
-        
-        # Build the Prometheus line format: metric{label="value"} value timestamp(ms)
+    # Add dummy labels if none are defined
+    labels = rule.get("labels", {"source": "custom_export"})
+
+    # Build the Prometheus line format: metric{label="value"} value timestamp(ms)
+    timestamp_ms = int(time.time() * 1000)  # Timestamp in milliseconds
+    if series is not None and len(series):
+        # One line per breaching series, keeping its labels
+        lines = series.to_prometheus_lines(rule['name'], labels, timestamp_ms)
+    else:
         label_str = ",".join([f'{k}="{v}"' for k, v in labels.items()])
-        timestamp_ms = int(datetime.utcnow().timestamp() * 1000)  # Timestamp in milliseconds
-        data = f"{rule['name']}{{{label_str}}} {value} {timestamp_ms}\n"  # Metric format
-        
-        # Send to VictoriaMetrics (vminsert endpoint)
-        headers = {'Content-Type': 'application/json'}  # Raw data format
-        response = requests.post(f"{vm_config['url']}", headers=headers, data=json.dumps(data))
-        
-        # Check the response from VictoriaMetrics
-        if response.status_code == 200:
-            print(f"Exported to VictoriaMetrics: {rule['name']} - value: {value}")
-        else:
-            print(f"Failed to export data to VictoriaMetrics: {response.status_code} - {response.text}")
+        lines = [f"{rule['name']}{{{label_str}}} {value} {timestamp_ms}"]
+    data = "\n".join(lines) + "\n"  # Metric format
+
+    # Send to VictoriaMetrics (vminsert endpoint). Errors propagate so the
+    # sink worker logs and counts them.
+    headers = {'Content-Type': 'text/plain'}  # Raw data format
+    response = get_session(url).post(url, headers=headers, data=data.encode())
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error exporting to VictoriaMetrics: {e}")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+    # The import endpoint answers 204 No Content on success
+    if not 200 <= response.status_code < 300:
+        raise requests.HTTPError(
+            f"VictoriaMetrics import failed: {response.status_code} - {response.text}", response=response)
+    logging.info(f"Exported to VictoriaMetrics: {rule['name']} (tenant {tenant}) - value: {value}, series: {len(lines)}")
@@ -0,0 +1,41 @@
+import os
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+from libs import planner
+
+
+def rule(query, condition=">", threshold=0, **extra):
+    return dict({"name": "r", "query": query, "condition": condition, "threshold": threshold}, **extra)
+
+
+def test_has_comparison():
+    assert planner._has_comparison("up > 0")
+    assert planner._has_comparison("a == bool b")
+    assert planner._has_comparison("sum(x) != 1")
+    assert not planner._has_comparison('up{job=~"a|b", env!="dev"}')
+    assert not planner._has_comparison('foo{path="<x>"}')
+    assert not planner._has_comparison("rate(foo[5m])")
+
+
+def test_plan_pushes_down_instant_vectors():
+    assert planner.plan(rule("up")) == ("(up) > 0", True)
+    assert planner.plan(rule("rate(foo[5m])", ">=", 2.5)) == ("(rate(foo[5m])) >= 2.5", True)
+    assert planner.plan(rule("max_over_time(x[1h:1m])", "<", 10)) == ("(max_over_time(x[1h:1m])) < 10", True)
+    assert planner.plan(rule("foo offset 5m", "==", 1)) == ("(foo offset 5m) == 1", True)
+
+
+def test_plan_leaves_range_vectors_alone():
+    for query in ("foo[5m]", 'foo{a="b"}[5m]', "x[1h:1m]", "rate(x[5m])[1h:1m]",
+                  "(foo[5m])", "foo[5m] offset 1h", "foo[5m] @ 1700000000", " foo[5m] "):
+        assert planner.plan(rule(query)) == (query, False), query
+
+
+def test_plan_skips_scalars_comparisons_and_opt_outs():
+    assert planner.plan(rule("scalar(up)")) == ("scalar(up)", False)
+    assert planner.plan(rule("42")) == ("42", False)
+    assert planner.plan(rule("up > 1")) == ("up > 1", False)
+    assert planner.plan(rule("up", pushdown=False)) == ("up", False)
+    assert planner.plan(rule("up", condition="~")) == ("up", False)
+    assert planner.plan(rule("up", threshold="high")) == ("up", False)
@@ -4,7 +4,6 @@ import json
 import time
 import os
 import logging
-import mysql.connector
 from datetime import datetime
 from urllib.parse import urlencode
 
@@ -49,10 +48,12 @@ def export_to_file(rule, value):
         f.write(json.dumps(alert) + "\n")
     logging.info(f"Exported to file: {path}")
 
-# Export data to MySQL
+# Export data to MySQL. The driver is imported here so runs without MySQL
+# rules never load it.
 def export_to_mysql(rule, value, exports):
     mysql_config = exports["mysql"]
     try:
+        import mysql.connector
         conn = mysql.connector.connect(
             host=mysql_config["host"],
             user=mysql_config["user"],
@@ -100,11 +101,12 @@ def evaluate_rule(rule, datasources, exports):
 
     if triggered:
         logging.info(f"Rule triggered: {rule['name']} - value: {value}")
-        export_type = rule["export"]["datastore"]
-        if export_type == "file":
-            export_to_file(rule, value)
-        elif export_type == "mysql":
-            export_to_mysql(rule, value, exports)
+        export = rule["export"]
+        for export_type in export.get("datastores") or [export["datastore"]]:
+            if export_type == "file":
+                export_to_file(rule, value)
+            elif export_type == "mysql":
+                export_to_mysql(rule, value, exports)
     else:
         logging.info(f"Rule not triggered: {rule['name']} - value: {value}")
 